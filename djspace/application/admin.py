@@ -1,18 +1,22 @@
 # -*- coding: utf-8 -*-
 
-import csv
 import datetime
-import tarfile
-from io import StringIO
+import os
+import tempfile
+from functools import lru_cache
+from functools import partial
 
 from django import forms
 from django.conf import settings
 from django.contrib import admin
 from django.contrib import messages
 from django.contrib.admin.helpers import ActionForm
-from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import prefetch_related_objects
+from django.http import FileResponse
 from django.http import HttpResponse
 from django.http import HttpResponseRedirect
+from django.http import StreamingHttpResponse
 from django.template import loader
 from django.urls import reverse
 from django.urls import reverse_lazy
@@ -22,14 +26,22 @@ from django.utils.html import strip_tags
 from django.utils.safestring import mark_safe
 from django.utils.text import Truncator
 from djspace.application.models import *
+from djspace.application.utils import EXPORT_CHUNK_SIZE
+from djspace.application.utils import application_exports
 from djspace.core.admin import PROFILE_LIST_DISPLAY
 from djspace.core.admin import GenericAdmin
+from djspace.core.models import ExportJob
 from djspace.core.models import UserFiles
+from djspace.core.models import prefetch_emails_auxiliary
+from djspace.core.models import prefetch_registrations
 from djspace.core.utils import admin_display_file
+from djspace.core.utils import field_accessor
+from djspace.core.utils import queryset_chunks
+from djspace.core.utils import tarball_stream
 from djspace.registration.admin import PROFILE_HEADERS
 from djspace.registration.admin import get_profile_fields
+from openpyxl import Workbook
 from openpyxl import load_workbook
-from openpyxl.writer.excel import save_virtual_workbook
 
 
 FUNDED_FILES = (
@@ -75,26 +87,40 @@ FUNDED_FILES = (
     ('institutional_w9', 'W9 Institutional'),
     ('irs_w9', 'W9 Personal'),
 )
+# number of applications handled between progress updates for export jobs
+EXPORT_JOB_CHUNK_SIZE = 20
+
+
+def _tarball_response(files, filename):
+    """Stream a gzipped tarball of (path, arcname) pairs to the browser."""
+    response = StreamingHttpResponse(
+        tarball_stream(files), content_type='application/x-gzip',
+    )
+    response['Content-Disposition'] = 'attachment; filename={0}.tar.gz'.format(
+        filename,
+    )
+    return response
+
+
+def required_file_paths(queryset):
+    """Generate the paths and archive names of the required program files."""
+    for instance in queryset.iterator():
+        for field in instance.required_files():
+            phile = getattr(instance, field)
+            if phile:
+                path = phile.path
+                path_list = path.split('/')
+                name = path_list[-1]
+                yield path, name
 
 
 def required_files(modeladmin, request, queryset):
     """Export required program files for all applicants to a tarball."""
-    if queryset:
-        object_name = modeladmin.model._meta.object_name
-        response = HttpResponse(content_type='application/x-gzip')
-        response['Content-Disposition'] = 'attachment; filename={0}.tar.gz'.format(
-            object_name,
+    object_name = modeladmin.model._meta.object_name
+    if queryset.exists():
+        response = _tarball_response(
+            required_file_paths(queryset), object_name,
         )
-        tar_ball = tarfile.open(fileobj=response, mode='w:gz')
-        for instance in queryset:
-            for field in instance.required_files():
-                phile = getattr(instance, field)
-                if phile:
-                    path = phile.path
-                    path_list = path.split('/')
-                    name = path_list[-1]
-                    tar_ball.add(path, arcname=name)
-        tar_ball.close()
     else:
         messages.add_message(
             request,
@@ -112,29 +138,30 @@ def required_files(modeladmin, request, queryset):
 
 def export_required_files(modeladmin, request, queryset):
     """Export required files."""
+    if queryset.count() > settings.EXPORT_JOB_THRESHOLD:
+        return queue_export_job(modeladmin, request, queryset, 'required_files')
     return required_files(modeladmin, request, queryset)
 
 
 export_required_files.short_description = "Export Required Files"
 
 
+def photo_file_paths(queryset):
+    """Generate the paths and archive names of the program photos."""
+    for instance in queryset.prefetch_related('photos'):
+        fotos = instance.photos.all()
+        for index, foto in enumerate(fotos):
+            path = '{0}/{1}'.format(settings.MEDIA_ROOT, str(foto.phile))
+            path_list = path.split('/')
+            name = '{0}_{1}_{2}'.format(instance.id, index, path_list[-1])
+            yield path, name
+
+
 def photo_files(modeladmin, request, queryset):
     """Export photos for all applicants to a tarball."""
-    if queryset:
-        object_name = modeladmin.model._meta.object_name
-        response = HttpResponse(content_type='application/x-gzip')
-        response['Content-Disposition'] = 'attachment; filename={0}.tar.gz'.format(
-            object_name,
-        )
-        tar_ball = tarfile.open(fileobj=response, mode='w:gz')
-        for instance in queryset:
-            fotos = instance.photos.all()
-            for index, foto in enumerate(fotos):
-                path = '{0}/{1}'.format(settings.MEDIA_ROOT, str(foto.phile))
-                path_list = path.split('/')
-                name = '{0}_{1}_{2}'.format(instance.id, index, path_list[-1])
-                tar_ball.add(path, name)
-        tar_ball.close()
+    object_name = modeladmin.model._meta.object_name
+    if queryset.exists():
+        response = _tarball_response(photo_file_paths(queryset), object_name)
     else:
         messages.add_message(
             request,
@@ -153,6 +180,8 @@ def photo_files(modeladmin, request, queryset):
 
 def export_photo_files(modeladmin, request, queryset):
     """Export photo files."""
+    if queryset.count() > settings.EXPORT_JOB_THRESHOLD:
+        return queue_export_job(modeladmin, request, queryset, 'photo_files')
     return photo_files(modeladmin, request, queryset)
 
 
@@ -161,37 +190,29 @@ export_photo_files.short_description = "Export Photos"
 
 def longitudinal_tracking(modeladmin, request):
     """Export application data to OpenXML file."""
-    users = User.objects.all().order_by('last_name')
-    program = None
-    exports = []
-    for user in users:
-        try:
-            apps = user.profile.applications.all()
-        except Exception:
-            apps = None
-        if apps:
-            for app in apps:
-                status = (
-                    app._meta.object_name == modeladmin.model._meta.object_name and
-                    app.status
-                )
-                if status:
-                    exports.append({'user': user, 'app': app})
-                    program = app.get_slug()
-
-    # this could all be accomplished by a list of lists but building a list
-    # for each row would be ugly. this seems more pythonic, and we can reuse
-    # for CSV export if need be.
+    program = modeladmin.model().get_slug()
     today = datetime.date.today()
     template = loader.get_template('application/export.longitudinal.html')
-    context = {'exports': exports, 'program': program, 'year': today.year}
-    rendered_data = smart_bytes(
-        template.render(context, request),
-        encoding='utf-8',
-        strings_only=False,
-        errors='strict',
-    )
-    response = HttpResponse(rendered_data, content_type='text/csv')
+
+    def rendered_rows():
+        # header row goes out even when nothing has been funded
+        context = {'exports': [], 'program': program, 'year': today.year}
+        yield smart_bytes(
+            template.render(dict(context, header=True), request),
+            encoding='utf-8',
+            strings_only=False,
+            errors='strict',
+        )
+        for exports in application_exports(modeladmin.model):
+            context['exports'] = exports
+            yield smart_bytes(
+                template.render(context, request),
+                encoding='utf-8',
+                strings_only=False,
+                errors='strict',
+            )
+
+    response = StreamingHttpResponse(rendered_rows(), content_type='text/csv')
     response['Content-Disposition'] = 'attachment;filename={0}.csv'.format(
         program,
     )
@@ -207,129 +228,191 @@ def export_longitudinal_tracking(modeladmin, request, extra_context=None):
 export_longitudinal_tracking.short_description = "Export Longitudinal Tracking"
 
 
-def export_applications(modeladmin, request, queryset, reg_type=None):
-    """Export application data to CSV."""
-    file_fields = [
-        'cv',
-        'proposal',
-        'letter_interest',
-        'budget',
-        'undergraduate_transcripts',
-        'graduate_transcripts',
-        'recommendation',
-        'recommendation_1',
-        'recommendation_2',
-        'high_school_transcripts',
-        'wsgc_advisor_recommendation',
-        'statement',
-    ]
-    username_fields = [
-        'co_advisor1',
-        'co_advisor2',
-        'co_advisor3',
-        'leader',
-        'grants_officer',
-        'grants_officer2',
-    ]
-    exclude = [
-        'user',
-        'userprofile',
-        'user_id',
-        'updated_by_id',
-        'id',
-        'aerospaceoutreach',
-        'clarkgraduatefellowship',
-        'first_nations_rocket_competition',
-        'collegiate_rocket_competition',
-        'earlystageinvestigator',
-        'midwest_high_powered_rocket_competition',
-        'graduatefellowship',
-        'undergraduateaerospacedesignresearchscholarship',
-        'highaltitudeballoonlaunch',
-        'highereducationinitiatives',
-        'industryinternship',
-        'nasacompetition',
-        'researchinfrastructure',
-        'specialinitiatives',
-        'undergraduateresearch',
-        'undergraduatescholarship',
-        'unmannedaerialvehiclesresearchscholarship',
-    ]
-
-    field_names = [field.name for field in modeladmin.model._meta.get_fields()]
-    headers = PROFILE_HEADERS + field_names
-    # remove unwanted headers
-    for exclu in exclude:
-        if exclu in headers:
-            headers.remove(exclu)
-
-    csv.register_dialect('pipes', delimiter='|')
-    buffy = StringIO()
-    writer = csv.writer(buffy, dialect='pipes')
-    writer.writerow(headers)
-
-    slug = None
-    for reg in queryset:
-        if not slug:
-            slug = reg.get_slug()
-        fields = []
-        profile_fields = get_profile_fields(reg)
-        # deal with non-standard characters
-        for prof in profile_fields:
-            fields.append(smart_str(prof))
-        field_names = [field.name for field in reg._meta.get_fields()]
-        for name in field_names:
-            if name and name not in exclude:
-                attr = getattr(reg, name, None)
-                if attr != '':
-                    if name == 'synopsis':
-                        attr = strip_tags(attr).strip()
-                    elif name in file_fields:
-                        earl = 'https://{0}{1}{2}'.format(
-                            settings.SERVER_URL, settings.MEDIA_URL, attr,
-                        )
-                        attr = '=HYPERLINK("{0}","{1}")'.format(earl, name)
-                    elif name in username_fields:
-                        if attr:
-                            attr = '{0}, {1} ({2})'.format(
-                                attr.last_name, attr.first_name, attr.email,
-                            )
-                fields.append(attr)
-        writer.writerow(fields)
+@lru_cache(maxsize=None)
+def _workbook_column_widths():
+    """Return the column widths from the applications.xlsx template."""
     wb = load_workbook(
         '{0}/application/applications.xlsx'.format(settings.ROOT_DIR),
     )
-    ws = wb.active
-    reader = csv.reader(StringIO(buffy.getvalue()), dialect='pipes')
-    for row in reader:
-        ws.append(row)
-
-    # in memory response instead of save to file system
-    response = HttpResponse(
-        save_virtual_workbook(wb), content_type='application/ms-excel',
-    )
+    return {
+        column: dimension.width
+        for column, dimension in wb.active.column_dimensions.items()
+    }
+
+
+# file fields that are exported as links to the file
+EXPORT_FILE_FIELDS = frozenset([
+    'cv',
+    'proposal',
+    'letter_interest',
+    'budget',
+    'undergraduate_transcripts',
+    'graduate_transcripts',
+    'recommendation',
+    'recommendation_1',
+    'recommendation_2',
+    'high_school_transcripts',
+    'wsgc_advisor_recommendation',
+    'statement',
+])
+# user foreign keys that are exported as name and email
+EXPORT_USERNAME_FIELDS = frozenset([
+    'co_advisor1',
+    'co_advisor2',
+    'co_advisor3',
+    'leader',
+    'grants_officer',
+    'grants_officer2',
+])
+EXPORT_EXCLUDE = frozenset([
+    'user',
+    'userprofile',
+    'user_id',
+    'updated_by_id',
+    'id',
+    'aerospaceoutreach',
+    'clarkgraduatefellowship',
+    'first_nations_rocket_competition',
+    'collegiate_rocket_competition',
+    'earlystageinvestigator',
+    'midwest_high_powered_rocket_competition',
+    'graduatefellowship',
+    'undergraduateaerospacedesignresearchscholarship',
+    'highaltitudeballoonlaunch',
+    'highereducationinitiatives',
+    'industryinternship',
+    'nasacompetition',
+    'researchinfrastructure',
+    'specialinitiatives',
+    'undergraduateresearch',
+    'undergraduatescholarship',
+    'unmannedaerialvehiclesresearchscholarship',
+])
+
+
+def _export_cell(attr):
+    """Return the text for a workbook cell, as it was when we wrote CSV."""
+    return '' if attr is None else smart_str(attr)
+
+
+def _synopsis_column(get):
+    """Return an accessor for the synopsis with the HTML stripped out."""
+    def column(obj):
+        attr = get(obj)
+        if attr != '':
+            attr = strip_tags(attr).strip()
+        return _export_cell(attr)
+    return column
+
+
+def _file_column(get, name):
+    """Return an accessor that builds a HYPERLINK formula for the file."""
+    prefix = 'https://{0}{1}'.format(settings.SERVER_URL, settings.MEDIA_URL)
+
+    def column(obj):
+        attr = get(obj)
+        if attr != '':
+            attr = '=HYPERLINK("{0}{1}","{2}")'.format(prefix, attr, name)
+        return _export_cell(attr)
+    return column
+
+
+def _username_column(get):
+    """Return an accessor for a user's name and email."""
+    def column(obj):
+        attr = get(obj)
+        if attr:
+            attr = '{0}, {1} ({2})'.format(
+                attr.last_name, attr.first_name, attr.email,
+            )
+        return _export_cell(attr)
+    return column
+
+
+@lru_cache(maxsize=None)
+def application_export_plan(model):
+    """
+    Compile the workbook headers and column accessors for a program model.
+
+    Done once per model class, so each row is a map over the accessors
+    rather than a walk through _meta.get_fields() and the lists above.
+    """
+    headers = list(PROFILE_HEADERS)
+    columns = []
+    for field in model._meta.get_fields():
+        name = field.name
+        if not name or name in EXPORT_EXCLUDE:
+            continue
+        headers.append(name)
+        get = field_accessor(field)
+        if name == 'synopsis':
+            columns.append(_synopsis_column(get))
+        elif name in EXPORT_FILE_FIELDS:
+            columns.append(_file_column(get, name))
+        elif name in EXPORT_USERNAME_FIELDS:
+            columns.append(_username_column(get))
+        else:
+            columns.append(lambda obj, get=get: _export_cell(get(obj)))
+    return tuple(headers), tuple(columns)
+
+
+def applications_workbook(model, queryset, phile):
+    """
+    Write the application data workbook to a file name or file object.
+
+    Rows go straight into a write-only workbook so that memory use stays
+    flat no matter how many applications there are.
+    """
+    headers, columns = application_export_plan(model)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Applications')
+    for column, width in _workbook_column_widths().items():
+        ws.column_dimensions[column].width = width
+    ws.append(headers)
+
+    queryset = queryset.select_related('user', 'user__profile')
+    for chunk in queryset_chunks(queryset, EXPORT_CHUNK_SIZE):
+        profiles = [reg.user.profile for reg in chunk]
+        prefetch_related_objects(profiles, 'race')
+        prefetch_registrations(profiles)
+        prefetch_emails_auxiliary(profiles)
+        for reg in chunk:
+            # deal with non-standard characters
+            fields = [smart_str(prof) for prof in get_profile_fields(reg)]
+            fields.extend([column(reg) for column in columns])
+            ws.append(fields)
+    wb.save(phile)
 
-    response['Content-Disposition'] = 'attachment;filename={0}.xlsx'.format(slug)
 
-    return response
+def export_applications(modeladmin, request, queryset, reg_type=None):
+    """Export application data to an excel workbook."""
+    phile = tempfile.TemporaryFile()
+    applications_workbook(modeladmin.model, queryset, phile)
+    phile.seek(0)
+    return FileResponse(
+        phile,
+        as_attachment=True,
+        filename='{0}.xlsx'.format(modeladmin.model().get_slug()),
+        content_type='application/ms-excel',
+    )
 
 
 def export_all_applications(modeladmin, request, queryset):
     """Export application data to CSV for all registration types."""
+    if queryset.count() > settings.EXPORT_JOB_THRESHOLD:
+        return queue_export_job(modeladmin, request, queryset, 'applications')
     return export_applications(modeladmin, request, queryset)
 
 
 export_all_applications.short_description = "Export All Applications"
 
 
-def _build_tarball(queryset, object_name, field, userfiles=False):
-    """Private function to build a tarball."""
-    response = HttpResponse(content_type='application/x-gzip')
-    response['Content-Disposition'] = 'attachment; filename={0}_{1}.tar.gz'.format(
-        object_name, field,
-    )
-    tar_ball = tarfile.open(fileobj=response, mode='w:gz')
-    for row in queryset:
+def funded_file_paths(queryset, field, userfiles=False):
+    """Generate the paths and archive names of one file field."""
+    if userfiles:
+        queryset = queryset.select_related('user__user_files')
+    for row in queryset.iterator():
         if userfiles:
             # some users might not have a user_files relationship
             try:
@@ -342,10 +425,15 @@ def _build_tarball(queryset, object_name, field, userfiles=False):
                 path = phile.path
                 path_list = path.split('/')
                 name = path_list[-1]
-                tar_ball.add(path, arcname=name)
-    tar_ball.close()
+                yield path, name
 
-    return response
+
+def _build_tarball(queryset, object_name, field, userfiles=False):
+    """Private function to build a tarball."""
+    return _tarball_response(
+        funded_file_paths(queryset, field, userfiles=userfiles),
+        '{0}_{1}'.format(object_name, field),
+    )
 
 
 def export_funded_files(modeladmin, request, queryset):
@@ -360,6 +448,12 @@ def export_funded_files(modeladmin, request, queryset):
         )
     else:
         object_name = modeladmin.model._meta.object_name
+        fields = [f.name for f in modeladmin.model._meta.get_fields()]
+        fields += [f.name for f in UserFiles._meta.get_fields()]
+        if phile in fields and queryset.count() > settings.EXPORT_JOB_THRESHOLD:
+            return queue_export_job(
+                modeladmin, request, queryset, 'funded_files', field=phile,
+            )
         if phile in [f.name for f in modeladmin.model._meta.get_fields()]:
             response = _build_tarball(queryset, object_name, phile)
             return response
@@ -380,6 +474,93 @@ def export_funded_files(modeladmin, request, queryset):
 export_funded_files.short_description = "Export Funded Files"
 
 
+def queue_export_job(modeladmin, request, queryset, action, field=None):
+    """Hand a heavy export off to the job queue instead of building it now."""
+    job = ExportJob.objects.create(
+        created_by=request.user,
+        content_type=ContentType.objects.get_for_model(modeladmin.model),
+        object_ids=','.join(
+            [str(pk) for pk in queryset.values_list('pk', flat=True)],
+        ),
+        action=action,
+        field=field,
+    )
+    messages.add_message(
+        request,
+        messages.SUCCESS,
+        mark_safe(
+            """
+            Your export has been queued. You can download it from the
+            <a href="{0}">export jobs</a> page when it is complete.
+            """.format(reverse('admin:core_exportjob_change', args=(job.id,))),
+        ),
+        extra_tags='success',
+    )
+    return HttpResponseRedirect(
+        reverse_lazy(
+            'admin:application_{0}_changelist'.format(
+                modeladmin.model._meta.model_name,
+            ),
+        ),
+    )
+
+
+def _export_job_files(job, queryset, file_paths):
+    """Generate the files for a job and record progress along the way."""
+    ids = job.get_object_ids()
+    for start in range(0, len(ids), EXPORT_JOB_CHUNK_SIZE):
+        stop = start + EXPORT_JOB_CHUNK_SIZE
+        yield from file_paths(queryset.filter(pk__in=ids[start:stop]))
+        job.progress = min(stop, len(ids))
+        job.save(update_fields=['progress', 'date_updated'])
+
+
+def run_export_job(job):
+    """Build the export file for a queued job, called by bin/export_jobs.py."""
+    model = job.content_type.model_class()
+    object_name = model._meta.object_name
+    queryset = model.objects.filter(pk__in=job.get_object_ids())
+    job.total = len(job.get_object_ids())
+    job.progress = 0
+    job.save(update_fields=['total', 'progress', 'date_updated'])
+    if job.action == 'applications':
+        filename = '{0}.xlsx'.format(model().get_slug())
+    else:
+        if job.action == 'required_files':
+            file_paths = required_file_paths
+        elif job.action == 'photo_files':
+            file_paths = photo_file_paths
+        else:
+            userfiles = job.field not in [f.name for f in model._meta.get_fields()]
+            file_paths = partial(
+                funded_file_paths, field=job.field, userfiles=userfiles,
+            )
+            object_name = '{0}_{1}'.format(object_name, job.field)
+        filename = '{0}.tar.gz'.format(object_name)
+    job.phile.name = os.path.join(job.get_file_path(), filename)
+    path = os.path.join(settings.MEDIA_ROOT, job.phile.name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if job.action == 'applications':
+        applications_workbook(model, queryset, path)
+    else:
+        with open(path, 'wb') as phile:
+            files = _export_job_files(job, queryset, file_paths)
+            for chunk in tarball_stream(files):
+                phile.write(chunk)
+    # the worker may have given up on the job while it ran
+    finished = ExportJob.objects.filter(pk=job.pk, status='running').update(
+        status='complete',
+        progress=job.total,
+        phile=job.phile.name,
+        date_updated=datetime.datetime.now(),
+    )
+    if finished:
+        job.progress = job.total
+        job.status = 'complete'
+    else:
+        job.refresh_from_db()
+
+
 class TarballActionForm(ActionForm):
     """Admin Form class for exporting data to a tarball."""
 
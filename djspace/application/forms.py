@@ -3,11 +3,9 @@
 from django import forms
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Count
 from django.utils.safestring import mark_safe
 from djspace.application.models import *
 from djspace.core.models import PAST_FUNDING_YEAR_CHOICES
-from djspace.core.utils import get_start_date
 from djtools.fields import BINARY_CHOICES
 from djtools.fields.localflavor import USPhoneNumberField
 
@@ -1926,9 +1924,9 @@ class FirstNationsRocketCompetitionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         """Override of the initialization method to set team choices."""
         super(FirstNationsRocketCompetitionForm, self).__init__(*args, **kwargs)
-        self.fields['team'].queryset = RocketLaunchTeam.objects.filter(
-            competition__contains='First Nations',
-        ).filter(date_created__gte=get_start_date()).order_by('name')
+        self.fields['team'].queryset = RocketLaunchTeam.objects.available(
+            ROCKET_COMPETITION_TEAMS['firstnationsrocketcompetition'],
+        )
 
     def clean(self):
         """Deal with TRA/NAR fields if need be."""
@@ -2012,15 +2010,9 @@ class MidwestHighPoweredRocketCompetitionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         """Override of the initialization method to set team choices."""
         super(MidwestHighPoweredRocketCompetitionForm, self).__init__(*args, **kwargs)
-        self.fields['team'].queryset = RocketLaunchTeam.objects.annotate(
-            count=Count('members'),
-        ).filter(
-            competition__in=['Midwest High Powered Rocket Competition'],
-        ).filter(
-            date_created__gte=get_start_date(),
-        ).exclude(
-            count__gte=settings.ROCKET_LAUNCH_COMPETITION_TEAM_LIMIT,
-        ).order_by("name")
+        self.fields['team'].queryset = RocketLaunchTeam.objects.available(
+            ROCKET_COMPETITION_TEAMS['midwesthighpoweredrocketcompetition'],
+        )
 
 
 class MidwestHighPoweredRocketCompetitionUploadsForm(forms.ModelForm):
@@ -2081,13 +2073,9 @@ class CollegiateRocketCompetitionForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         """Override of the initialization method to set team choices."""
         super(CollegiateRocketCompetitionForm, self).__init__(*args, **kwargs)
-        self.fields['team'].queryset = RocketLaunchTeam.objects.annotate(
-            count=Count('members'),
-        ).filter(competition__in=["Collegiate Rocket Competition"]).filter(
-            date_created__gte=get_start_date(),
-        ).exclude(
-            count__gte=settings.ROCKET_LAUNCH_COMPETITION_TEAM_LIMIT,
-        ).order_by("name")
+        self.fields['team'].queryset = RocketLaunchTeam.objects.available(
+            ROCKET_COMPETITION_TEAMS['collegiaterocketcompetition'],
+        )
 
     def clean(self):
         """Deal with TRA/NAR fields if need be."""
@@ -2575,3 +2563,29 @@ class OtherProgramUploadsForm(forms.ModelForm):
             'other_file2',
             'other_file3',
         )
+
+
+# upload forms keyed by the model name of the application
+UPLOAD_FORMS = {
+    'highereducationinitiatives': HigherEducationInitiativesUploadsForm,
+    'earlystageinvestigator': EarlyStageInvestigatorUploadsForm,
+    'researchinfrastructure': ResearchInfrastructureUploadsForm,
+    'aerospaceoutreach': AerospaceOutreachUploadsForm,
+    'specialinitiatives': SpecialInitiativesUploadsForm,
+    'undergraduatescholarship': UndergraduateScholarshipUploadsForm,
+    'stembridgescholarship': StemBridgeScholarshipUploadsForm,
+    'womeninaviationscholarship': WomenInAviationScholarshipUploadsForm,
+    'undergraduateresearch': UndergraduateResearchUploadsForm,
+    'graduatefellowship': GraduateFellowshipUploadsForm,
+    'clarkgraduatefellowship': ClarkGraduateFellowshipUploadsForm,
+    'undergraduateaerospacedesignresearchscholarship': UndergraduateAerospaceDesignResearchScholarshipUploadsForm,
+    'rocketlaunchteam': RocketLaunchTeamUploadsForm,
+    'firstnationsrocketcompetition': FirstNationsRocketCompetitionUploadsForm,
+    'midwesthighpoweredrocketcompetition': MidwestHighPoweredRocketCompetitionUploadsForm,
+    'collegiaterocketcompetition': CollegiateRocketCompetitionUploadsForm,
+    'nasacompetition': NasaCompetitionUploadsForm,
+    'otherprogram': OtherProgramUploadsForm,
+    'industryinternship': IndustryInternshipUploadsForm,
+    'professionalprogramstudent': ProfessionalProgramStudentUploadsForm,
+    'unmannedaerialvehiclesresearchscholarship': UnmannedAerialVehiclesResearchScholarshipUploadsForm,
+}
@@ -1,31 +1,53 @@
 # -*- coding: utf-8 -*-
 
-import datetime
+import hashlib
 import re
 from functools import partial
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.core.validators import FileExtensionValidator
 from django.db import models
+from django.db import transaction
+from django.db.models import Count
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from djspace.core.models import FILE_VALIDATORS
 from djspace.core.models import PHOTO_VALIDATORS
 from djspace.core.models import BaseModel
+from djspace.core.utils import get_grant_cycle
+from djspace.core.utils import get_start_date
 from djspace.core.utils import get_term
 from djspace.core.utils import upload_to_path
+from djspace.core.validators import PPTX_MIMETYPE
+from djspace.core.validators import XLSX_MIMETYPE
+from djspace.core.validators import MagicValidator
 from djtools.fields import BINARY_CHOICES
 
 
-TODAY = datetime.date.today()
-YEAR_2 = int(TODAY.strftime('%y'))
-if TODAY.month >= settings.GRANT_CYCLE_START_MES:
-    YEAR_2 = YEAR_2 + 1
-
-PPT_EXTENSIONS = [FileExtensionValidator(allowed_extensions=['ppt', 'pptx', 'pot', 'pps']),]
-OPENROCKET_EXTENSIONS = [FileExtensionValidator(allowed_extensions=['rkt'])]
-SPREADSHEET_VALIDATORS = [FileExtensionValidator(allowed_extensions=['xls', 'xlsx'])]
+# ppt, pot and pps are OLE2 compound files, pptx and xlsx are zip files
+PPT_EXTENSIONS = [
+    FileExtensionValidator(allowed_extensions=['ppt', 'pptx', 'pot', 'pps']),
+    MagicValidator(PPTX_MIMETYPE, 'application/x-ole-storage'),
+]
+# rocksim files are plain xml, openrocket files are gzipped or zipped xml
+OPENROCKET_EXTENSIONS = [
+    FileExtensionValidator(allowed_extensions=['rkt']),
+    MagicValidator('text/xml', 'application/gzip', 'application/zip'),
+]
+SPREADSHEET_VALIDATORS = [
+    FileExtensionValidator(allowed_extensions=['xls', 'xlsx']),
+    MagicValidator(XLSX_MIMETYPE, 'application/x-ole-storage'),
+]
 if settings.DEBUG:
     PPT_EXTENSIONS = []
     OPENROCKET_EXTENSIONS = []
@@ -189,6 +211,18 @@ ROCKET_LAUNCH_COMPETITION_WITH_LIMIT = [
     'Midwest High Powered Rocket Competition',
     'Collegiate Rocket Competition',
 ]
+# rocket launch team competitions that each competition application joins
+ROCKET_COMPETITION_TEAMS = {
+    'collegiaterocketcompetition': ['Collegiate Rocket Competition'],
+    'firstnationsrocketcompetition': [
+        'First Nations Mars Challenge',
+        'First Nations Moon Challenge',
+        'First Nations Gateway Challenge',
+    ],
+    'midwesthighpoweredrocketcompetition': [
+        'Midwest High Powered Rocket Competition',
+    ],
+}
 EDUCATION_INITITATIVES_PROGRAMS = [
     'aerospaceoutreach',
     'earlystageinvestigator',
@@ -234,6 +268,11 @@ OTHER_PROGRAM_PURPOSE = (
 )
 
 
+def get_year_2():
+    """Return the two digit year the current grant cycle ends in."""
+    return get_grant_cycle().year % 100
+
+
 class EducationInitiatives(BaseModel):
     """Education Initiatives abstract base model."""
 
@@ -559,7 +598,7 @@ class HigherEducationInitiatives(EducationInitiatives):
         award_type = 'MNR'
         if 'Major' in self.award_type:
             award_type = 'MJR'
-        return 'HEI{0}_{1}'.format(YEAR_2, award_type)
+        return 'HEI{0}_{1}'.format(get_year_2(), award_type)
 
     def get_absolute_url(self):
         """Returns the absolute URL from root URL."""
@@ -631,7 +670,7 @@ class ResearchInfrastructure(EducationInitiatives):
         award_type = 'MNR'
         if 'Major' in self.award_type:
             award_type = 'MJR'
-        return 'RIP{0}_{1}'.format(YEAR_2, award_type)
+        return 'RIP{0}_{1}'.format(get_year_2(), award_type)
 
     def __str__(self):
         """Default data for display."""
@@ -715,7 +754,7 @@ class EarlyStageInvestigator(EducationInitiatives):
         award_type = 'MNR'
         if 'Major' in self.award_type:
             award_type = 'MJR'
-        return 'ESI{0}_{1}'.format(YEAR_2, award_type)
+        return 'ESI{0}_{1}'.format(get_year_2(), award_type)
 
     def __str__(self):
         """Default data for display."""
@@ -820,7 +859,7 @@ class AerospaceOutreach(EducationInitiatives):
         project_category = 'IE'
         if 'K-12' in self.project_category:
             project_category = 'K12'
-        return 'AOP{0}_{1}'.format(YEAR_2, project_category)
+        return 'AOP{0}_{1}'.format(get_year_2(), project_category)
 
     def get_absolute_url(self):
         """Returns the absolute URL from root URL."""
@@ -910,7 +949,7 @@ class SpecialInitiatives(EducationInitiatives):
         project_category = 'IE'
         if 'K-12' in self.project_category:
             project_category = 'K12'
-        return 'SIP{0}_{1}'.format(YEAR_2, project_category)
+        return 'SIP{0}_{1}'.format(get_year_2(), project_category)
 
     def get_absolute_url(self):
         """Returns the absolute URL from root URL."""
@@ -925,6 +964,63 @@ class SpecialInitiatives(EducationInitiatives):
         verbose_name_plural = "Special Initiatives"
 
 
+class RocketLaunchTeamManager(models.Manager):
+    """Lookups for the teams that students can still join."""
+
+    @staticmethod
+    def get_cache_key(competition):
+        """Return the cache key for the open teams in a competition."""
+        return 'rocket_launch_teams_{0}_{1}'.format(
+            hashlib.sha1(competition.encode('utf-8')).hexdigest(),
+            get_start_date().year,
+        )
+
+    def available_ids(self, competitions):
+        """
+        Return the IDs of this grant cycle's teams that have room left.
+
+        Each competition is cached on its own and dropped from the cache
+        whenever a team or its members change.
+        """
+        keys = {self.get_cache_key(comp): comp for comp in competitions}
+        found = cache.get_many(list(keys))
+        for key, competition in keys.items():
+            if key not in found:
+                teams = self.filter(
+                    competition=competition,
+                    date_created__gte=get_start_date(),
+                )
+                if competition in ROCKET_LAUNCH_COMPETITION_WITH_LIMIT:
+                    teams = teams.filter(
+                        member_count__lt=settings.ROCKET_LAUNCH_COMPETITION_TEAM_LIMIT,
+                    )
+                found[key] = list(teams.values_list('id', flat=True))
+                cache.set(key, found[key])
+        return [tid for key in keys for tid in found[key]]
+
+    def available(self, competitions):
+        """Return the teams in the competitions that have room left."""
+        return self.filter(
+            pk__in=self.available_ids(competitions),
+        ).order_by('name')
+
+    def invalidate(self):
+        """Drop the cached open teams for every competition."""
+        cache.delete_many([
+            self.get_cache_key(competition)
+            for competition, label in ROCKET_COMPETITIONS
+        ])
+
+    def update_member_counts(self, tids):
+        """Recount the members of the teams in one UPDATE."""
+        members = self.model.members.through.objects.filter(
+            rocketlaunchteam=OuterRef('pk'),
+        ).values('rocketlaunchteam').annotate(count=Count('pk')).values('count')
+        self.filter(pk__in=tids).update(
+            member_count=Coalesce(Subquery(members), 0),
+        )
+
+
 class RocketLaunchTeam(BaseModel):
     """Rocket Launch Team for rocket launch competitions."""
 
@@ -980,6 +1076,8 @@ class RocketLaunchTeam(BaseModel):
         related_name='rocket_launch_team_grants_officer2',
     )
     members = models.ManyToManyField(User, related_name='rocket_launch_team_members')
+    # kept current by the rocket_launch_team_members signal
+    member_count = models.PositiveIntegerField(default=0, editable=False)
     industry_mentor_name = models.CharField(
         "Industry, Tripoli, or National Rocketry Association mentor name",
         max_length=128,
@@ -998,7 +1096,9 @@ class RocketLaunchTeam(BaseModel):
         """,
     )
     # meta
-    competition = models.CharField(max_length=128, choices=ROCKET_COMPETITIONS)
+    competition = models.CharField(
+        max_length=128, choices=ROCKET_COMPETITIONS, db_index=True,
+    )
     # files
     proposal = models.FileField(
         upload_to=partial(upload_to_path, 'Proposal'),
@@ -1335,6 +1435,8 @@ class RocketLaunchTeam(BaseModel):
     member_14 = models.CharField(max_length=128, null=True, blank=True)
     member_15 = models.CharField(max_length=128, null=True, blank=True)
 
+    objects = RocketLaunchTeamManager()
+
     class Meta:
         """Attributes about the data model and admin options."""
 
@@ -1356,7 +1458,7 @@ class RocketLaunchTeam(BaseModel):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'RLT{0}'.format(YEAR_2)
+        return 'RLT{0}'.format(get_year_2())
 
     def get_file_path(self):
         """Construct the file path prefix."""
@@ -1376,12 +1478,12 @@ class RocketLaunchTeam(BaseModel):
     def get_file_name(self, lackey=False):
         """Construct the file name based on code, team, school, person's name."""
         if self.competition == 'Collegiate Rocket Competition':
-            code = 'CRL{0}'.format(YEAR_2)
+            code = 'CRL{0}'.format(get_year_2())
         elif self.competition == 'Midwest High Powered Rocket Competition':
-            code = 'MRL{0}'.format(YEAR_2)
+            code = 'MRL{0}'.format(get_year_2())
         elif 'First Nations' in self.competition:
             suffix = self.competition.split(' ')[2]
-            code = 'FNL{0}_{1}'.format(YEAR_2, suffix)
+            code = 'FNL{0}_{1}'.format(get_year_2(), suffix)
         last_name = self.user.last_name
         first_name = self.user.first_name
         if lackey:
@@ -1609,7 +1711,7 @@ class MidwestHighPoweredRocketCompetition(BaseModel):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'MRL{0}'.format(YEAR_2)
+        return 'MRL{0}'.format(get_year_2())
 
     def get_file_name(self, lackey=False):
         """Construct the file name based on code, team, school, user."""
@@ -1692,7 +1794,7 @@ class CollegiateRocketCompetition(BaseModel):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'CRL{0}'.format(YEAR_2)
+        return 'CRL{0}'.format(get_year_2())
 
     def get_file_name(self, lackey=False):
         """Construct the file name based on code, team, school, user."""
@@ -1769,7 +1871,7 @@ class FirstNationsRocketCompetition(BaseModel):
             suffix = 'Mars'
         else:
             suffix = 'Moon'
-        return 'FNL{0}_{1}'.format(YEAR_2, suffix)
+        return 'FNL{0}_{1}'.format(get_year_2(), suffix)
 
     def get_file_name(self, lackey=False):
         """Construct the file name based on code, user."""
@@ -1914,7 +2016,7 @@ class HighAltitudeBalloonLaunch(HighAltitudeBalloon):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'EBL{0}'.format(YEAR_2)
+        return 'EBL{0}'.format(get_year_2())
 
     class Meta:
         """Attributes about the data model and admin options."""
@@ -1948,7 +2050,7 @@ class UndergraduateAerospaceDesignResearchScholarship(HighAltitudeBalloon):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'UAS{0}'.format(YEAR_2)
+        return 'UAS{0}'.format(get_year_2())
 
     class Meta:
         """Attributes about the data model and admin options."""
@@ -1973,7 +2075,7 @@ class UnmannedAerialVehiclesResearchScholarship(HighAltitudeBalloon):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'UAV{0}'.format(YEAR_2)
+        return 'UAV{0}'.format(get_year_2())
 
     class Meta:
         """Attributes about the data model and admin options."""
@@ -2189,7 +2291,7 @@ class ClarkGraduateFellowship(Fellowship):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'LSC{0}'.format(YEAR_2)
+        return 'LSC{0}'.format(get_year_2())
 
 
 class GraduateFellowship(Fellowship):
@@ -2205,7 +2307,7 @@ class GraduateFellowship(Fellowship):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'RFP{0}'.format(YEAR_2)
+        return 'RFP{0}'.format(get_year_2())
 
 
 class UndergraduateResearch(BaseModel):
@@ -2340,7 +2442,7 @@ class UndergraduateResearch(BaseModel):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'UGR{0}'.format(YEAR_2)
+        return 'UGR{0}'.format(get_year_2())
 
     def form(self):
         """Return the corresponding data model form for this data class model."""
@@ -2568,7 +2670,7 @@ class WomenInAviationScholarship(Scholarship):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'WAS{0}'.format(YEAR_2)
+        return 'WAS{0}'.format(get_year_2())
 
     def get_absolute_url(self):
         """Returns the absolute URL from root URL."""
@@ -2602,7 +2704,7 @@ class UndergraduateScholarship(Scholarship):
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
         return 'UGS{0}_{1}'.format(
-            YEAR_2, self.get_academic_institution(),
+            get_year_2(), self.get_academic_institution(),
         )
 
     def get_absolute_url(self):
@@ -2630,7 +2732,7 @@ class StemBridgeScholarship(Scholarship):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'SBS{0}'.format(YEAR_2)
+        return 'SBS{0}'.format(get_year_2())
 
     def get_absolute_url(self):
         """Returns the absolute URL from root URL."""
@@ -2914,7 +3016,7 @@ class NasaCompetition(BaseModel):
         else:
             program = 'other'
         return 'OPP{0}_{1}_{2}'.format(
-            YEAR_2, get_term(self.date_created), program,
+            get_year_2(), get_term(self.date_created), program,
         )
 
     def required_files(self):
@@ -3226,7 +3328,7 @@ class IndustryInternship(BaseModel):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'IIP{0}'.format(YEAR_2)
+        return 'IIP{0}'.format(get_year_2())
 
     def required_files(self):
         """Used when building a tarball of required files."""
@@ -3432,7 +3534,7 @@ class ProfessionalProgramStudent(BaseModel):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'PPS{0}_{1}'.format(YEAR_2, self.program)
+        return 'PPS{0}_{1}'.format(get_year_2(), self.program)
 
     def irs_w9(self):
         """Return the user's IRS W9 file object."""
@@ -3509,7 +3611,7 @@ class OtherProgram(BaseModel):
 
     def get_code(self):
         """Three letter code for WSGC administrative purposes."""
-        return 'OPP{0}_{1}'.format(YEAR_2, self.purpose)
+        return 'OPP{0}_{1}'.format(get_year_2(), self.purpose)
 
     def required_files(self):
         """Used when building a tarball of required files."""
@@ -3555,3 +3657,51 @@ class WorkPlanTask(models.Model):
     def __str__(self):
         """Default data for display."""
         return "{0}".format(self.title)
+
+
+@receiver(m2m_changed, sender=RocketLaunchTeam.members.through, dispatch_uid='application.rocket_launch_team_members')
+def rocket_launch_team_members(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep member_count current when people join or leave a team."""
+    if action == 'pre_clear' and reverse:
+        # the links are gone by post_clear so note the user's teams now
+        instance._cleared_teams = list(sender.objects.filter(
+            user=instance,
+        ).values_list('rocketlaunchteam', flat=True))
+    elif action in {'post_add', 'post_remove', 'post_clear'}:
+        if not reverse:
+            tids = [instance.pk]
+        elif action == 'post_clear':
+            tids = getattr(instance, '_cleared_teams', [])
+        else:
+            tids = pk_set
+        if tids:
+            # runs inside the transaction that changed the members
+            RocketLaunchTeam.objects.update_member_counts(tids)
+            transaction.on_commit(RocketLaunchTeam.objects.invalidate)
+
+
+@receiver(pre_delete, sender=User, dispatch_uid='application.rocket_launch_team_member_deleting')
+def rocket_launch_team_member_deleting(sender, instance, **kwargs):
+    """Note the teams of a user who is about to be deleted."""
+    # the cascade removes the memberships without sending m2m_changed
+    instance._deleted_teams = list(
+        RocketLaunchTeam.members.through.objects.filter(
+            user=instance,
+        ).values_list('rocketlaunchteam', flat=True),
+    )
+
+
+@receiver(post_delete, sender=User, dispatch_uid='application.rocket_launch_team_member_deleted')
+def rocket_launch_team_member_deleted(sender, instance, **kwargs):
+    """Recount the teams of a deleted user once the memberships are gone."""
+    tids = getattr(instance, '_deleted_teams', None)
+    if tids:
+        RocketLaunchTeam.objects.update_member_counts(tids)
+        transaction.on_commit(RocketLaunchTeam.objects.invalidate)
+
+
+@receiver(post_save, sender=RocketLaunchTeam, dispatch_uid='application.rocket_launch_team_saved')
+@receiver(post_delete, sender=RocketLaunchTeam, dispatch_uid='application.rocket_launch_team_deleted')
+def rocket_launch_team_invalidate(sender, **kwargs):
+    """Drop the cached open teams when a team is created, edited or deleted."""
+    transaction.on_commit(RocketLaunchTeam.objects.invalidate)
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+from django.contrib.contenttypes.models import ContentType
+from djspace.core.models import UserProfile
+from djspace.core.models import prefetch_emails_auxiliary
+from djspace.core.utils import EXPORT_CHUNK_SIZE
+from djspace.core.utils import get_email_auxiliary
+from djspace.core.utils import get_registrations
+
+
+# columns for the NASA reporting CSV exports
+EXPORT_HEADERS = [
+    'last_name',
+    'first_name',
+    'birthday',
+    'email1',
+    'program',
+    'program type',
+    'year',
+    'report_year',
+    'consortium',
+    'university',
+    'gender',
+    'ethnicity',
+    'race',
+    'university_level',
+    'Mentor first',
+    'Mentor last',
+    'Mentor email',
+    'veteran',
+    'middle_name',
+    'major',
+    'location',
+    'student_no',
+    'email2',
+    'amount',
+    'Significant',
+    'c address1',
+    'c address2',
+    'city',
+    'state',
+    'zip',
+    'phone',
+    'disabled',
+    'year_1',
+]
+
+
+def _export_rows(apps):
+    """
+    Bundle a chunk of applications with everyone related to them.
+
+    Rows keep the order of the applications; the people related to each
+    application follow it, sorted by last name.
+    """
+    apps = {app.pk: app for app in apps}
+    model = next(iter(apps.values()))._meta.model
+    links = UserProfile.applications.through.objects.filter(
+        gm2m_ct=ContentType.objects.get_for_model(model),
+        gm2m_pk__in=[str(pk) for pk in apps],
+    ).select_related(
+        'gm2m_src', 'gm2m_src__user',
+    ).prefetch_related(
+        'gm2m_src__race',
+    ).order_by('gm2m_src__user__last_name')
+    profiles = [link.gm2m_src for link in links]
+    registrations = get_registrations(profiles)
+    prefetch_emails_auxiliary(profiles)
+    related = {pk: [] for pk in apps}
+    for link in links:
+        related[int(link.gm2m_pk)].append(link.gm2m_src)
+    rows = []
+    for pk, app in apps.items():
+        for profile in related[pk]:
+            rows.append({
+                'user': profile.user,
+                'app': app,
+                'registration': registrations.get(profile.user_id),
+                'email_auxiliary': get_email_auxiliary(profile.user),
+                'race': ','.join([raza.name for raza in profile.race.all()]),
+            })
+    return rows
+
+
+def application_exports(model, queryset=None):
+    """
+    Generate export rows for a program's applications in chunks.
+
+    Starts from the program's applications (funded ones by default) rather
+    than from the user table and resolves everyone who is related to them
+    through the gm2m field (applicants, co-advisors, team leaders, grants
+    officers). Applications are read with a server side iterator, so the
+    number of queries depends on the number of chunks and memory use does
+    not grow with the number of applicants.
+    """
+    if queryset is None:
+        queryset = model.objects.filter(status=True)
+    queryset = queryset.order_by('user__last_name')
+    chunk = []
+    for app in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        chunk.append(app)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            yield _export_rows(chunk)
+            chunk = []
+    if chunk:
+        yield _export_rows(chunk)
+
+
+def export_row(export, program, year):
+    """Construct a CSV row from one of the dictionaries built above."""
+    user = export['user']
+    profile = user.profile
+    app = export['app']
+    reg = export['registration']
+    graduation = getattr(reg, 'month_year_of_graduation', None) or ''
+    return [
+        user.last_name,
+        user.first_name,
+        profile.date_of_birth,
+        user.email,
+        program,
+        '',
+        app.date_updated.year,
+        year,
+        '53140',
+        getattr(reg, 'wsgc_affiliate', None),
+        profile.gender,
+        export['race'],
+        export['race'],
+        getattr(reg, 'class_year', None),
+        '',
+        '',
+        '',
+        profile.military,
+        profile.second_name,
+        getattr(reg, 'major', None),
+        getattr(reg, 'wsgc_affiliate', None),
+        getattr(reg, 'studentid', None),
+        export['email_auxiliary'],
+        getattr(app, 'funds_requested', None),
+        getattr(app, 'funds_authorized', None),
+        profile.address1_current,
+        profile.address2_current,
+        profile.city_current,
+        profile.state_current,
+        profile.postal_code_current,
+        profile.phone_primary,
+        profile.disability,
+        graduation[3:],
+    ]
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
-import os
+import csv
 import datetime
+import os
 import django
 
 from django.conf import settings
@@ -9,10 +10,10 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count
 from django.http import Http404
 from django.http import HttpResponse
 from django.http import HttpResponseRedirect
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.shortcuts import render
 from django.template import loader
@@ -21,15 +22,23 @@ from django.views.decorators.csrf import csrf_exempt
 from djspace.application.forms import *
 from djspace.application.models import EDUCATION_INITITATIVES_PROGRAMS
 from djspace.application.models import PROFESSIONAL_PROGRAMS
+from djspace.application.models import ROCKET_COMPETITION_TEAMS
 from djspace.application.models import ROCKET_LAUNCH_COMPETITION_WITH_LIMIT
 from djspace.application.models import STUDENT_PROFESSIONAL_PROGRAMS
 from djspace.application.models import ProfessionalProgramStudent
+from djspace.application.utils import EXPORT_HEADERS
+from djspace.application.utils import application_exports
+from djspace.application.utils import export_row
 from djspace.core.forms import UserFilesForm
+from djspace.core.models import ApplicationIndex
+from djspace.core.models import FilesStatus
 from djspace.core.models import UserFiles
+from djspace.core.resolver import get_application_form
+from djspace.core.resolver import get_application_model
+from djspace.core.utils import Echo
 from djspace.core.utils import profile_status
+from djspace.core.utils import queue_mail
 from djtools.fields.helpers import handle_uploaded_file
-from djtools.utils.convert import str_to_class
-from djtools.utils.mail import send_mail
 
 
 @login_required
@@ -40,14 +49,11 @@ def application_form(request, application_type, aid=None):
     app_name = slug_list.pop(0).capitalize()
     for name in slug_list:
         app_name += ' {0}'.format(name.capitalize())
-    app_type = ''.join(app_name.split(' '))
 
     # we need the application model now and if it barfs
     # we throw a 404
     try:
-        mod = django.apps.apps.get_model(
-            app_label='application', model_name=app_type,
-        )
+        mod = get_application_model(application_type)
     except Exception:
         raise Http404
     # name to display at the template level
@@ -95,17 +101,10 @@ def application_form(request, application_type, aid=None):
     # currently, FNL does not have a limit so we can exclude it.
     teams = None
     if 'rocket-competition' in application_type:
-        teams = RocketLaunchTeam.objects.filter(
-            competition__contains=app_name[:12],
+        teams = RocketLaunchTeam.objects.available_ids(
+            ROCKET_COMPETITION_TEAMS[application_type.replace('-', '')],
         )
 
-        if application_type != 'first-nations-rocket-competition':
-            teams = teams.annotate(
-                count=Count('members'),
-            ).exclude(
-                count__gte=settings.ROCKET_LAUNCH_COMPETITION_TEAM_LIMIT,
-            ).order_by('name')
-
         if not teams:
             return render(
                 request,
@@ -168,16 +167,14 @@ def application_form(request, application_type, aid=None):
                 go2_orig = app.grants_officer2
 
     # fetch the form class
-    formclass = str_to_class(
-        'djspace.application.forms', '{0}Form'.format(app_type),
-    )
+    formclass = get_application_form(application_type)
     # fetch the form instance
     try:
         form = formclass(
             instance=app, label_suffix='', use_required_attribute=False,
         )
     except Exception:
-        # app_type does not match an existing form
+        # application_type does not match an existing form
         raise Http404
     # GET or POST
     if request.method == 'POST':
@@ -208,7 +205,7 @@ def application_form(request, application_type, aid=None):
                     use_required_attribute=False,
                 )
         except Exception:
-            # app_type does not match an existing form
+            # application_type does not match an existing form
             raise Http404
 
         if form.is_valid():
@@ -244,9 +241,7 @@ def application_form(request, application_type, aid=None):
                     'Student Ambassador',
                 ]
                 if program not in excludes:
-                    mod = django.apps.apps.get_model(
-                        app_label='application', model_name=program,
-                    )
+                    mod = get_application_model(program)
                     pk = request.POST.get('program_submissions')
                     if pk:
                         submission = mod.objects.get(pk=int(pk))
@@ -398,6 +393,11 @@ def application_form(request, application_type, aid=None):
                 elif go2 and not go2_orig:
                     # new application or new co-advisor on update
                     go2.profile.applications.add(data)
+            # gm2m add() does not send signals, so refresh the application
+            # index and the required files status for everyone who is now
+            # related to the application
+            ApplicationIndex.objects.sync_application(data)
+            FilesStatus.objects.refresh_application(data)
             # email confirmation
             template = 'application/email/{0}.html'.format(application_type)
             if not settings.DEBUG:
@@ -418,7 +418,7 @@ def application_form(request, application_type, aid=None):
                     data.user.first_name,
                 )
                 frum = data.user.email
-                send_mail(
+                queue_mail(
                     request,
                     to_list,
                     subject,
@@ -477,9 +477,7 @@ def get_program_submissions(request):
 
         user = User.objects.get(pk=mentor_id)
         try:
-            mod = django.apps.apps.get_model(
-                app_label='application', model_name=program,
-            )
+            mod = get_application_model(program)
             programs = mod.objects.filter(user=user)
         except Exception:
             programs = None
@@ -493,15 +491,7 @@ def get_program_submissions(request):
 def application_print(request, application_type, aid):
     """Print view for applications. AKA: the demographic page/view."""
     user = request.user
-    # munge the application type
-    slug_list = application_type.split('-')
-    app_name = slug_list.pop(0).capitalize()
-    for slug in slug_list:
-        app_name += ' {0}'.format(slug.capitalize())
-    app_type = ''.join(app_name.split(' '))
-    mod = django.apps.apps.get_model(
-        app_label='application', model_name=app_type,
-    )
+    mod = get_application_model(application_type)
     content_type = ContentType.objects.get_for_model(mod)
     instance = get_object_or_404(mod, pk=aid)
     if instance.user == user or user.is_superuser:
@@ -530,40 +520,28 @@ def application_print(request, application_type, aid):
 @staff_member_required
 def application_export(request, application_type):
     """Export applications."""
-    users = User.objects.all().order_by('last_name')
+    try:
+        mod = get_application_model(application_type)
+    except Exception:
+        raise Http404
+    program = mod().get_application_type()
+    year = datetime.date.today().year
 
-    today = datetime.date.today()
-    exports = []
-    for user in users:
-        try:
-            apps = user.profile.applications.all()
-        except Exception:
-            apps = None
-        if apps:
-            for app in apps:
-                if app.get_slug() == application_type:
-                    exports.append({'user': user, 'app': app})
-                    program = app.get_application_type()
+    def csv_rows():
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_HEADERS)
+        for exports in application_exports(mod, mod.objects.all()):
+            for export in exports:
+                yield writer.writerow(export_row(export, program, year))
 
     if settings.DEBUG:
-        response = render(
-            request,
-            'application/export.html',
-            {'exports': exports, 'program': program, 'year': today.year},
-            content_type='text/plain; charset=utf-8',
+        response = StreamingHttpResponse(
+            csv_rows(), content_type='text/plain; charset=utf-8',
         )
     else:
-        response = HttpResponse(content_type='text/csv')
+        response = StreamingHttpResponse(csv_rows(), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="{0}.csv"'.format(
             application_type,
         )
 
-        template = loader.get_template('application/export.html')
-        context = {
-            'exports': exports,
-            'program': program,
-            'year': today.year,
-        }
-        response.write(template.render(context, request))
-
     return response
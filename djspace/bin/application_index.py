@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sys
+
+import django
+
+# env
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djspace.settings.shell')
+
+# required if using django models
+django.setup()
+
+from django.contrib.contenttypes.models import ContentType
+from djspace.core.models import ApplicationIndex
+from djspace.core.models import UserProfile
+
+
+logger = logging.getLogger('debug_logfile')
+
+# set up command-line options
+desc = """
+Rebuilds the ApplicationIndex table from the gm2m relationships between
+user profiles and applications.
+"""
+
+# RawTextHelpFormatter method allows for new lines in help text
+parser = argparse.ArgumentParser(
+    description=desc, formatter_class=argparse.RawTextHelpFormatter,
+)
+
+parser.add_argument(
+    '--test',
+    action='store_true',
+    help="Dry run?",
+    dest='test',
+)
+
+
+def main():
+    """Index every application that is linked to a user profile."""
+    links = {}
+    through = UserProfile.applications.through.objects.values_list(
+        'gm2m_ct', 'gm2m_pk', 'gm2m_src__user',
+    )
+    for ct_id, oid, uid in through:
+        links.setdefault(ct_id, []).append((int(oid), uid))
+    for ct_id, pairs in links.items():
+        mod = ContentType.objects.get_for_id(ct_id).model_class()
+        apps = mod.objects.in_bulk({oid for oid, uid in pairs})
+        rows = []
+        for oid, uid in pairs:
+            app = apps.get(oid)
+            if not app:
+                logger.debug('missing {0}: {1}'.format(mod.__name__, oid))
+                continue
+            rows.append(ApplicationIndex(
+                user_id=uid,
+                content_type_id=ct_id,
+                object_id=oid,
+                date_created=app.date_created,
+                status=app.status,
+                complete=app.complete,
+                multi_year=app.multi_year(),
+            ))
+        if test:
+            print(mod.__name__, len(rows))
+        else:
+            ApplicationIndex.objects.filter(content_type_id=ct_id).delete()
+            ApplicationIndex.objects.bulk_create(rows, batch_size=500)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    test = args.test
+
+    if test:
+        print(args)
+
+    sys.exit(main())
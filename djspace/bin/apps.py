@@ -15,6 +15,7 @@ django.setup()
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from djspace.core.models import prefetch_applications
 from djspace.core.utils import get_start_date
 
 logger = logging.getLogger('debug_logfile')
@@ -50,7 +51,8 @@ def main():
     start_date = get_start_date()
     #print(user.profile.__dict__)
     try:
-        apps = user.profile.applications.all().order_by('-id')
+        prefetch_applications([user])
+        apps = user.profile.get_applications()
     except Exception:
         apps = None
     if apps:
@@ -0,0 +1,123 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+from datetime import timedelta
+
+import django
+
+# env
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djspace.settings.shell')
+
+# required if using django models
+django.setup()
+
+from django.conf import settings
+from djspace.application.admin import run_export_job
+from djspace.core.models import ExportJob
+
+
+logger = logging.getLogger('debug_logfile')
+
+# set up command-line options
+desc = """
+Runs the admin exports that have been queued in the ExportJob table.
+Run it from cron, or with --loop to keep polling for new jobs.
+"""
+
+# RawTextHelpFormatter method allows for new lines in help text
+parser = argparse.ArgumentParser(
+    description=desc, formatter_class=argparse.RawTextHelpFormatter,
+)
+
+parser.add_argument(
+    '--loop',
+    action='store_true',
+    help="Keep polling for new jobs.",
+    dest='loop',
+)
+parser.add_argument(
+    '-s',
+    '--sleep',
+    type=int,
+    default=10,
+    help="Seconds to wait between polls when looping.",
+    dest='sleep',
+)
+parser.add_argument(
+    '--test',
+    action='store_true',
+    help="Dry run?",
+    dest='test',
+)
+
+
+def fail_stale_jobs():
+    """Fail the jobs whose worker died or hung past EXPORT_JOB_TIMEOUT."""
+    expired = datetime.now() - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT)
+    stale = ExportJob.objects.filter(status='running').filter(
+        date_claimed__lt=expired,
+    )
+    for job in stale:
+        logger.debug('export job {0} timed out'.format(job.id))
+    return stale.update(
+        status='failed',
+        error='The export did not finish within {0} seconds.'.format(
+            settings.EXPORT_JOB_TIMEOUT,
+        ),
+    )
+
+
+def claim_job():
+    """Claim the oldest queued job so that other workers skip it."""
+    for job in ExportJob.objects.filter(status='queued').order_by('id'):
+        now = datetime.now()
+        claimed = ExportJob.objects.filter(
+            pk=job.pk, status='queued',
+        ).update(status='running', date_claimed=now)
+        if claimed:
+            job.status = 'running'
+            job.date_claimed = now
+            return job
+    return None
+
+
+def main():
+    """Run queued export jobs until there are none left."""
+    while True:
+        if test:
+            for job in ExportJob.objects.filter(status='queued').order_by('id'):
+                print(job.id, job)
+            return
+        fail_stale_jobs()
+        job = claim_job()
+        if job:
+            try:
+                run_export_job(job)
+            except Exception:
+                logger.debug('export job {0} failed'.format(job.id))
+                job.status = 'failed'
+                job.error = traceback.format_exc()
+                job.save()
+        elif loop:
+            time.sleep(sleep)
+        else:
+            return
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    loop = args.loop
+    sleep = args.sleep
+    test = args.test
+
+    if test:
+        print(args)
+
+    sys.exit(main())
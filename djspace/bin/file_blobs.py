@@ -0,0 +1,79 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import django
+
+# env
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djspace.settings.shell')
+
+# required if using django models
+django.setup()
+
+from django.conf import settings
+from djspace.core.uploads import BLOB_DIR
+
+
+logger = logging.getLogger('debug_logfile')
+
+# set up command-line options
+desc = """
+Removes content addressed blobs that no uploaded file links to anymore,
+which happens when every file with that content has been deleted. Blobs
+that changed within the grace period are left alone, since an upload may
+be about to link to them.
+"""
+
+# RawTextHelpFormatter method allows for new lines in help text
+parser = argparse.ArgumentParser(
+    description=desc, formatter_class=argparse.RawTextHelpFormatter,
+)
+
+parser.add_argument(
+    '-g',
+    '--grace',
+    type=int,
+    default=24,
+    help="Hours to keep a blob after it last changed.",
+    dest='grace',
+)
+parser.add_argument(
+    '--test',
+    action='store_true',
+    help="Dry run?",
+    dest='test',
+)
+
+
+def main():
+    """Delete the blobs whose only remaining link is the blob itself."""
+    root = os.path.join(settings.MEDIA_ROOT, BLOB_DIR)
+    expired = time.time() - grace * 60 * 60
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path)
+            # ctime moves whenever a link to the blob is made or removed
+            if stat.st_nlink > 1 or stat.st_ctime > expired:
+                continue
+            if test:
+                print(path)
+            else:
+                logger.debug('removing orphan blob: {0}'.format(path))
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    grace = args.grace
+    test = args.test
+
+    if test:
+        print(args)
+
+    sys.exit(main())
@@ -0,0 +1,77 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sys
+
+import django
+
+# env
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djspace.settings.shell')
+
+# required if using django models
+django.setup()
+
+from django.apps import apps
+from djspace.core.models import StoredFile
+from djspace.core.models import _file_fields
+from djspace.core.models import _stat_timestamp
+
+
+logger = logging.getLogger('debug_logfile')
+
+# set up command-line options
+desc = """
+Records the timestamps for files that were uploaded before we started
+storing them in the StoredFile table.
+"""
+
+# RawTextHelpFormatter method allows for new lines in help text
+parser = argparse.ArgumentParser(
+    description=desc, formatter_class=argparse.RawTextHelpFormatter,
+)
+
+parser.add_argument(
+    '--test',
+    action='store_true',
+    help="Dry run?",
+    dest='test',
+)
+
+
+def main():
+    """Stat every uploaded file once and store its timestamp."""
+    stored = set(StoredFile.objects.values_list('name_hash', flat=True))
+    for app_label in ('application', 'core', 'registration'):
+        for model in apps.get_app_config(app_label).get_models():
+            fields = _file_fields(model)
+            if not fields:
+                continue
+            for row in model.objects.values_list(*fields):
+                for name in row:
+                    if not name or StoredFile.get_name_hash(name) in stored:
+                        continue
+                    try:
+                        timestamp = _stat_timestamp(name)
+                    except OSError as error:
+                        logger.debug('no timestamp for {0}: {1}'.format(
+                            name, error,
+                        ))
+                        continue
+                    if test:
+                        print(timestamp, name)
+                    else:
+                        StoredFile.objects.record(name, timestamp)
+                    stored.add(StoredFile.get_name_hash(name))
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    test = args.test
+
+    if test:
+        print(args)
+
+    sys.exit(main())
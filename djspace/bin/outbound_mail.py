@@ -0,0 +1,133 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import django
+
+# env
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djspace.settings.shell')
+
+# required if using django models
+django.setup()
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.core.mail import get_connection
+from djspace.core.models import OutboundMail
+
+
+logger = logging.getLogger('debug_logfile')
+
+# set up command-line options
+desc = """
+Sends the email that has been queued in the OutboundMail table.
+Run it from cron, or with --loop to keep polling for new messages.
+"""
+
+# RawTextHelpFormatter method allows for new lines in help text
+parser = argparse.ArgumentParser(
+    description=desc, formatter_class=argparse.RawTextHelpFormatter,
+)
+
+parser.add_argument(
+    '--loop',
+    action='store_true',
+    help="Keep polling for new messages.",
+    dest='loop',
+)
+parser.add_argument(
+    '-s',
+    '--sleep',
+    type=int,
+    default=10,
+    help="Seconds to wait between polls when looping.",
+    dest='sleep',
+)
+parser.add_argument(
+    '--test',
+    action='store_true',
+    help="Dry run?",
+    dest='test',
+)
+
+
+def claim_batch():
+    """Claim a batch of queued messages so that other workers skip them."""
+    batch = []
+    mail = OutboundMail.objects.filter(status='queued').order_by('id')
+    for message in mail[:settings.OUTBOUND_MAIL_BATCH_SIZE]:
+        claimed = OutboundMail.objects.filter(
+            pk=message.pk, status='queued',
+        ).update(status='sending')
+        if claimed:
+            batch.append(message)
+    return batch
+
+
+def send_batch(batch):
+    """Send the messages over a single connection to the mail provider."""
+    connection = get_connection()
+    connection.open()
+    try:
+        for message in batch:
+            email = EmailMessage(
+                message.subject,
+                message.body,
+                message.from_email,
+                OutboundMail.split_addresses(message.recipients),
+                bcc=OutboundMail.split_addresses(message.bcc),
+                reply_to=OutboundMail.split_addresses(message.reply_to),
+                connection=connection,
+            )
+            email.content_subtype = 'html'
+            message.attempts += 1
+            try:
+                email.send()
+            except Exception as error:
+                logger.debug('outbound mail {0}: {1}'.format(message.id, error))
+                message.error = str(error)
+                if message.attempts >= settings.OUTBOUND_MAIL_MAX_ATTEMPTS:
+                    message.status = 'failed'
+                else:
+                    message.status = 'queued'
+            else:
+                message.status = 'sent'
+                message.date_sent = datetime.now()
+                message.error = None
+            message.save()
+    finally:
+        connection.close()
+
+
+def main():
+    """Send queued messages until there are none left."""
+    while True:
+        if test:
+            for message in OutboundMail.objects.filter(status='queued').order_by('id'):
+                print(message.id, message.recipients, message)
+            return
+        batch = claim_batch()
+        if batch:
+            send_batch(batch)
+        elif loop:
+            time.sleep(sleep)
+        else:
+            return
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    loop = args.loop
+    sleep = args.sleep
+    test = args.test
+
+    if test:
+        print(args)
+
+    sys.exit(main())
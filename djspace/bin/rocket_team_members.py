@@ -0,0 +1,58 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sys
+
+import django
+
+# env
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djspace.settings.shell')
+
+# required if using django models
+django.setup()
+
+from djspace.application.models import RocketLaunchTeam
+
+
+logger = logging.getLogger('debug_logfile')
+
+# set up command-line options
+desc = """
+Recounts the members of every rocket launch team and stores the result
+in RocketLaunchTeam.member_count.
+"""
+
+# RawTextHelpFormatter method allows for new lines in help text
+parser = argparse.ArgumentParser(
+    description=desc, formatter_class=argparse.RawTextHelpFormatter,
+)
+
+parser.add_argument(
+    '--test',
+    action='store_true',
+    help="Dry run?",
+    dest='test',
+)
+
+
+def main():
+    """Recount the team members and drop the cached open teams."""
+    tids = list(RocketLaunchTeam.objects.values_list('id', flat=True))
+    if test:
+        print(len(tids))
+    else:
+        RocketLaunchTeam.objects.update_member_counts(tids)
+        RocketLaunchTeam.objects.invalidate()
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    test = args.test
+
+    if test:
+        print(args)
+
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import logging
+import os
+import sys
+
+import django
+
+# env
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'djspace.settings.shell')
+
+# required if using django models
+django.setup()
+
+from django.contrib.auth.models import User
+from djspace.core.models import UserNameIndex
+from djspace.core.utils import normalize_name
+
+
+logger = logging.getLogger('debug_logfile')
+
+# set up command-line options
+desc = """
+Rebuilds the UserNameIndex table that backs the name autocomplete.
+"""
+
+# RawTextHelpFormatter method allows for new lines in help text
+parser = argparse.ArgumentParser(
+    description=desc, formatter_class=argparse.RawTextHelpFormatter,
+)
+
+parser.add_argument(
+    '--test',
+    action='store_true',
+    help="Dry run?",
+    dest='test',
+)
+
+
+def main():
+    """Store the normalized names for every user."""
+    names = []
+    for uid, first, last in User.objects.values_list('id', 'first_name', 'last_name'):
+        names.append(UserNameIndex(
+            user_id=uid,
+            first_name=normalize_name(first)[:150],
+            last_name=normalize_name(last)[:150],
+        ))
+    if test:
+        for name in names:
+            print(name.user_id, name)
+    else:
+        UserNameIndex.objects.all().delete()
+        UserNameIndex.objects.bulk_create(names, batch_size=1000)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    test = args.test
+
+    if test:
+        print(args)
+
+    sys.exit(main())
@@ -0,0 +1 @@
+default_app_config = 'djspace.core.apps.CoreConfig'
@@ -2,14 +2,21 @@
 
 from django.contrib import admin
 from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import prefetch_related_objects
 from django.shortcuts import render
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from djspace.core.forms import EmailApplicantsForm
+from djspace.core.models import ExportJob
 from djspace.core.models import GenericChoice
+from djspace.core.models import OutboundMail
+from djspace.core.models import prefetch_emails_auxiliary
+from djspace.core.models import prefetch_file_icons
+from djspace.core.models import prefetch_registrations
 from djspace.core.models import UserProfile
 from djspace.core.utils import admin_display_file
 from djspace.core.utils import get_email_auxiliary
@@ -73,6 +80,28 @@ class CSSAdminMixin(object):
         }
 
 
+class GenericChangeList(ChangeList):
+    """Changelist that loads the user data for a page of results in bulk."""
+
+    def get_results(self, request):
+        """Preload race, registration, secondary email and file icons."""
+        super(GenericChangeList, self).get_results(request)
+        profiles = []
+        for instance in self.result_list:
+            try:
+                profiles.append(instance.user.profile)
+            except Exception:
+                continue
+        prefetch_related_objects(profiles, 'race')
+        prefetch_registrations(profiles)
+        prefetch_emails_auxiliary(
+            [instance.user for instance in self.result_list],
+        )
+        if 'team' in {field.name for field in self.model._meta.get_fields()}:
+            prefetch_related_objects(self.result_list, 'team')
+        prefetch_file_icons(self.result_list)
+
+
 class GenericAdmin(admin.ModelAdmin, CSSAdminMixin):
     """
     Base admin class.
@@ -123,6 +152,7 @@ class GenericAdmin(admin.ModelAdmin, CSSAdminMixin):
     )
 
     list_per_page = 20
+    list_select_related = ('user', 'user__profile', 'user__user_files')
     raw_id_fields = ('user', 'updated_by')
 
     class Media:
@@ -142,6 +172,10 @@ class GenericAdmin(admin.ModelAdmin, CSSAdminMixin):
             '/static/djspace/js/admin.js',
         )
 
+    def get_changelist(self, request, **kwargs):
+        """Use the changelist that loads the user data in bulk."""
+        return GenericChangeList
+
     def salutation(self, instance):
         """Return the user's salutation."""
         return instance.user.profile.salutation
@@ -288,7 +322,10 @@ class GenericAdmin(admin.ModelAdmin, CSSAdminMixin):
 
     def wsgc_affiliate(self, instance):
         """Return the user's WSGC affiliate organization."""
-        reggie = instance.user.profile.get_registration()
+        try:
+            reggie = instance.user.profile.get_registration()
+        except Exception:
+            reggie = None
         try:
             wsgc_affiliate = reggie.wsgc_affiliate
         except Exception:
@@ -391,6 +428,85 @@ class GenericChoiceAdmin(admin.ModelAdmin):
     list_display = ('name', 'value', 'ranking', 'active')
 
 
+class OutboundMailAdmin(admin.ModelAdmin):
+    """Outbound mail admin."""
+
+    list_display = [
+        'subject',
+        'recipients',
+        'date_created',
+        'date_sent',
+        'status',
+        'attempts',
+    ]
+    list_filter = ('status',)
+    date_hierarchy = 'date_created'
+    search_fields = ('subject', 'recipients')
+    readonly_fields = [
+        'subject',
+        'from_email',
+        'recipients',
+        'bcc',
+        'reply_to',
+        'date_sent',
+        'attempts',
+        'error',
+    ]
+    exclude = ('body',)
+
+    def has_add_permission(self, request):
+        """Messages are only created by the views that send email."""
+        return False
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    """Export job admin."""
+
+    list_display = [
+        'action',
+        'content_type',
+        'created_by',
+        'date_created',
+        'status',
+        'progress_display',
+        'download',
+    ]
+    list_filter = ('status', 'action')
+    date_hierarchy = 'date_created'
+    readonly_fields = [
+        'action',
+        'content_type',
+        'field',
+        'status',
+        'date_claimed',
+        'progress',
+        'total',
+        'error',
+        'download',
+    ]
+    exclude = ('object_ids', 'phile')
+
+    def has_add_permission(self, request):
+        """Jobs are only created by the admin export actions."""
+        return False
+
+    def progress_display(self, instance):
+        """Return the progress of the job."""
+        return '{0}/{1}'.format(instance.progress, instance.total)
+    progress_display.short_description = "Progress"
+
+    def download(self, instance):
+        """Construct the link to download the export file."""
+        link = None
+        if instance.status == 'complete' and instance.phile:
+            link = mark_safe('<a href="{0}">{1}</a>'.format(
+                instance.get_absolute_url(), instance.phile.name.split('/')[-1],
+            ))
+        return link
+    download.allow_tags = True
+    download.short_description = "Download"
+
+
 class ProfileAdmin(admin.ModelAdmin):
     """User profile admin."""
 
@@ -445,6 +561,8 @@ class UserProfileAdmin(UserAdmin):
     inlines = (UserProfileInline,)
 
 
+admin.site.register(ExportJob, ExportJobAdmin)
+admin.site.register(OutboundMail, OutboundMailAdmin)
 admin.site.register(GenericChoice, GenericChoiceAdmin)
 admin.site.unregister(User)
 admin.site.register(User, UserProfileAdmin)
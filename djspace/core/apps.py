@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    """Core application configuration."""
+
+    name = 'djspace.core'
+
+    def ready(self):
+        """Build the model and form lookup table used by the views."""
+        from djspace.core import resolver
+        resolver.populate()
@@ -21,7 +21,6 @@ from djtools.fields.localflavor import USPhoneNumberField
 
 
 DOB_YEAR = date.today().year - 10
-RACES = GenericChoice.objects.filter(tags__name__in=['Race']).order_by('ranking')
 
 
 class EmailApplicantsForm(forms.Form):
@@ -47,6 +46,11 @@ class EmailApplicantsForm(forms.Form):
 class SignupForm(forms.Form):
     """Gathers auth and user profile data."""
 
+    def __init__(self, *args, **kwargs):
+        """Override the initialization method to set race choices."""
+        super(SignupForm, self).__init__(*args, **kwargs)
+        self.fields['race'].queryset = GenericChoice.objects.tagged(['Race'])
+
     registration_type = forms.CharField(
         max_length=32,
         widget=forms.Select(choices=REG_TYPE),
@@ -73,7 +77,7 @@ class SignupForm(forms.Form):
     )
     race = forms.ModelMultipleChoiceField(
         label="Race and Ethnicity",
-        queryset=RACES,
+        queryset=GenericChoice.objects.none(),
         help_text='Check all that apply',
         widget=forms.CheckboxSelectMultiple(),
     )
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
 import os
+import secrets
 import time
 from datetime import date
 from datetime import datetime
+from functools import lru_cache
 from functools import partial
 from os.path import getmtime
 from os.path import join
@@ -15,23 +18,42 @@ from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 from django.db import models
+from django.db.models import Case
+from django.db.models import IntegerField
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models import When
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from django.urls import reverse
+from djspace.core.utils import USER_FILE_FIELDS
+from djspace.core.utils import file_icon
 from djspace.core.utils import get_email_auxiliary
+from djspace.core.utils import get_emails_auxiliary
+from djspace.core.utils import get_registrations
 from djspace.core.utils import get_start_date
+from djspace.core.utils import missing_files
+from djspace.core.utils import normalize_name
 from djspace.core.utils import profile_status
 from djspace.core.utils import registration_notify
 from djspace.core.utils import upload_to_path
+from djspace.core.uploads import ContentAddressedStorage
+from djspace.core.validators import MagicValidator
 from djtools.fields import BINARY_CHOICES
 from djtools.fields import GENDER_CHOICES
 from djtools.fields import SALUTATION_TITLES
 from djtools.fields import STATE_CHOICES
-from djtools.fields.validators import MimetypeValidator
 from gm2m import GM2MField
 from taggit.managers import TaggableManager
+from taggit.models import Tag
+from taggit.models import TaggedItem
 
 
 ALLOWED_EXTENSIONS = [
@@ -52,9 +74,12 @@ ALLOWED_EXTENSIONS = [
 # do not seem to work
 #SPREADSHEET_VALIDATORS = [MimetypeValidator('application/vnd.ms-excel')]  # xls
 #SPREADSHEET_VALIDATORS = [MimetypeValidator('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')]  #  xlsx
-FILE_VALIDATORS = [MimetypeValidator('application/pdf')]
-PHOTO_VALIDATORS = [MimetypeValidator('image/jpeg')]
+FILE_VALIDATORS = [MagicValidator('application/pdf')]
+PHOTO_VALIDATORS = [MagicValidator('image/jpeg')]
 ALLOWED_EXTENSIONS_VALIDATOR = [FileExtensionValidator(allowed_extensions=ALLOWED_EXTENSIONS)]
+# the profile files are uploaded again every grant cycle, often unchanged,
+# so identical copies share one blob on disk
+USER_FILES_STORAGE = ContentAddressedStorage()
 if settings.DEBUG:
     FILE_VALIDATORS = []
     PHOTO_VALIDATORS = []
@@ -132,6 +157,30 @@ MEDIA_RELEASE = (
     ('I do not agree', "I do not agree"),
     ('I am a minor', "I am a minor and will submit a media release signed by a guardian."),
 )
+EXPORT_JOB_ACTIONS = (
+    ('applications', "Export All Applications"),
+    ('required_files', "Export Required Files"),
+    ('funded_files', "Export Funded Files"),
+    ('photo_files', "Export Photos"),
+)
+EXPORT_JOB_STATUS = (
+    ('queued', "Queued"),
+    ('running', "Running"),
+    ('complete', "Complete"),
+    ('failed', "Failed"),
+)
+OUTBOUND_MAIL_STATUS = (
+    ('queued', "Queued"),
+    ('sending', "Sending"),
+    ('sent', "Sent"),
+    ('failed', "Failed"),
+)
+
+
+# cache version for the generic choices that are looked up by tag
+GENERIC_CHOICES_VERSION_KEY = 'generic_choices_version'
+# per process copy of the generic choice IDs, keyed by (tags, active)
+_generic_choices = {}
 
 
 def _file_validators(phile):
@@ -148,35 +197,109 @@ def _file_validators(phile):
     raise err
 
 
-def _timestamp(phile, field):
+def _stat_timestamp(name):
     """Obtain the timestamp from the file system."""
-    attr = getattr(phile, field, None)
-    path = join(settings.MEDIA_ROOT, attr.name)
+    path = join(settings.MEDIA_ROOT, name)
+    if os.stat(path).st_nlink > 1:
+        # hard links to a shared blob carry the mtime of its first upload
+        raise OSError('shared blob, no upload time: {0}'.format(name))
     # ctime() does not refer to creation time on *nix systems,
     # but rather the last time the inode data changed: time.ctime(getctime(path))
     # time.gmtime() returns the time in UTC so we use time.localtime()
+    return datetime.fromtimestamp(
+        time.mktime(time.localtime(getmtime(path))),
+    )
 
-    try:
-        ts = datetime.fromtimestamp(
-            time.mktime(time.localtime(getmtime(path))),
-        )
-    except Exception:
+
+def file_timestamp(name):
+    """
+    Obtain the timestamp for a file name under MEDIA_ROOT.
+
+    Reads through the cache and the StoredFile table, and only falls back
+    to the file system for files that have not been recorded yet, which
+    then get recorded so the next lookup does not touch the disk.
+    """
+    ts = None
+    if name:
+        key = StoredFile.get_cache_key(name)
+        ts = cache.get(key)
+        if ts is None:
+            stored = StoredFile.objects.filter(
+                name_hash=StoredFile.get_name_hash(name),
+            ).first()
+            if stored:
+                ts = stored.timestamp
+            else:
+                try:
+                    ts = _stat_timestamp(name)
+                except Exception:
+                    ts = None
+                else:
+                    StoredFile.objects.record(name, ts)
+            if ts:
+                cache.set(key, ts)
+    if ts is None:
         if settings.DEBUG:
             # we might not have the files on dev/staging
             ts = datetime.today()
         else:
             ts = 'File not found.'
-
     return ts
 
 
+def file_timestamps(names):
+    """
+    Obtain the timestamps for many file names at once.
+
+    One cache round trip and one StoredFile query for the lot, only names
+    that have never been recorded go through file_timestamp() one by one.
+    """
+    names = {name for name in names if name}
+    keys = {StoredFile.get_cache_key(name): name for name in names}
+    timestamps = {
+        keys[key]: ts for key, ts in cache.get_many(list(keys)).items()
+    }
+    hashes = {
+        StoredFile.get_name_hash(name): name
+        for name in names if name not in timestamps
+    }
+    if hashes:
+        stored = StoredFile.objects.filter(
+            name_hash__in=list(hashes),
+        ).values_list('name_hash', 'timestamp')
+        found = {}
+        for name_hash, ts in stored:
+            timestamps[hashes[name_hash]] = ts
+            found[StoredFile.get_cache_key(hashes[name_hash])] = ts
+        cache.set_many(found)
+    for name in names:
+        if name not in timestamps:
+            timestamps[name] = file_timestamp(name)
+    return timestamps
+
+
+def _timestamp(phile, field):
+    """Obtain the timestamp for the file in the field."""
+    attr = getattr(phile, field, None)
+    return file_timestamp(getattr(attr, 'name', None))
+
+
+@lru_cache(maxsize=None)
+def _file_fields(model):
+    """Return the attribute names of the file fields on a data model."""
+    return tuple(
+        field.attname for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    )
+
+
 def limit_race():
     """Obtain the IDs for race generic choices."""
-    return [
-        genchoi.id for genchoi in GenericChoice.objects.filter(
-            tags__name__in=['Race'],
-        ).order_by('name')
-    ]
+    return list(
+        GenericChoice.objects.tagged(['Race'], order_by=('name',)).values_list(
+            'id', flat=True,
+        ),
+    )
 
 
 class Photo(models.Model):
@@ -432,6 +555,54 @@ class BaseModel(Base):
         return self.get_file_timestamp('other_file3')
 
 
+class GenericChoiceManager(models.Manager):
+    """Cached lookups of the choices by tag."""
+
+    def tagged_ids(self, tags, active=None):
+        """
+        Return the IDs of the choices with any of the tags.
+
+        The IDs are kept in memcached, shared by all of the workers, and in
+        a per process dictionary. Both are keyed by a version stamp that
+        the GenericChoice and tag signals replace, so changes show up without
+        restarting the workers. The stamp is a timestamp rather than a
+        counter, so losing it to an eviction never brings back old IDs.
+        """
+        version = cache.get(GENERIC_CHOICES_VERSION_KEY)
+        if version is None:
+            version = time.time_ns()
+            if not cache.add(GENERIC_CHOICES_VERSION_KEY, version, None):
+                version = cache.get(GENERIC_CHOICES_VERSION_KEY, version)
+        lookup = (tuple(sorted(tags)), active)
+        local = _generic_choices.get(lookup)
+        if local and local[0] == version:
+            return local[1]
+        key = 'generic_choices_{0}_{1}'.format(
+            version,
+            hashlib.sha1(repr(lookup).encode('utf-8')).hexdigest(),
+        )
+        ids = cache.get(key)
+        if ids is None:
+            choices = self.filter(tags__name__in=tags)
+            if active is not None:
+                choices = choices.filter(active=active)
+            ids = sorted(set(choices.values_list('id', flat=True)))
+            cache.set(key, ids)
+        _generic_choices[lookup] = (version, ids)
+        return ids
+
+    def tagged(self, tags, active=None, order_by=('ranking',)):
+        """Return a queryset of the choices with any of the tags."""
+        return self.filter(
+            pk__in=self.tagged_ids(tags, active=active),
+        ).order_by(*order_by)
+
+    def invalidate(self):
+        """Drop the cached choices in every process."""
+        cache.set(GENERIC_CHOICES_VERSION_KEY, time.time_ns(), None)
+        _generic_choices.clear()
+
+
 class GenericChoice(models.Model):
     """For making choices for choice fields for forms."""
 
@@ -453,6 +624,8 @@ class GenericChoice(models.Model):
     )
     tags = TaggableManager()
 
+    objects = GenericChoiceManager()
+
     def __str__(self):
         """Default display value."""
         return self.name
@@ -475,6 +648,7 @@ class UserFiles(models.Model):
     mugshot = models.FileField(
         "Photo",
         upload_to=partial(upload_to_path, 'Photo'),
+        storage=USER_FILES_STORAGE,
         validators=PHOTO_VALIDATORS,
         max_length=768,
         null=True,
@@ -483,6 +657,7 @@ class UserFiles(models.Model):
     )
     biography = models.FileField(
         upload_to=partial(upload_to_path, 'Bio'),
+        storage=USER_FILES_STORAGE,
         validators=FILE_VALIDATORS,
         max_length=768,
         null=True,
@@ -492,6 +667,7 @@ class UserFiles(models.Model):
     irs_w9 = models.FileField(
         "IRS W9",
         upload_to=partial(upload_to_path, 'W9'),
+        storage=USER_FILES_STORAGE,
         validators=FILE_VALIDATORS,
         max_length=768,
         null=True,
@@ -522,12 +698,14 @@ class UserFiles(models.Model):
         """Return the timestamp for the phile. i.e. when it was created."""
         return _timestamp(self, field)
 
-    def status(self, field):
+    def status(self, field, start_date=None):
         """Determine if the file was uploaded before the deadline date."""
         timestamp = self.get_file_timestamp(field)
+        if start_date is None:
+            start_date = get_start_date()
         stat = True
         try:
-            if timestamp < get_start_date():
+            if timestamp < start_date:
                 stat = False
         except Exception as error:
             stat = False
@@ -714,6 +892,12 @@ class UserProfile(models.Model):
         """Return the secondary email for the user."""
         return get_email_auxiliary(self.user)
 
+    def get_applications(self):
+        """Return the applications, newest link first."""
+        if getattr(self, '_applications', None) is None:
+            prefetch_applications([self])
+        return self._applications
+
     def get_race(self):
         """Return all of the race choices selected by the user."""
         race = ""
@@ -722,7 +906,7 @@ class UserProfile(models.Model):
         return race[:-1]
 
     def get_registration(self):
-        """Return registration relationship for the user."""
+        """Return registration relationship for the user or None, memoized."""
         # these imports need to be here, rather than at the top with the others
         import django
         from djspace.registration.models import Faculty
@@ -732,15 +916,619 @@ class UserProfile(models.Model):
         from djspace.registration.models import Professional
         from djspace.registration.models import Undergraduate
 
+        memo = getattr(self, '_registration', None)
+        if memo is not None and memo[0] == self.registration_type:
+            return memo[1]
         reggie = None
         if self.registration_type:
             mod = django.apps.apps.get_model(
                 app_label='registration', model_name=self.registration_type,
             )
-            reggie = mod.objects.get(user=self.user)
+            reggie = mod.objects.filter(user=self.user).first()
+        self._registration = (self.registration_type, reggie)
         return reggie
 
 
+def _user_profiles(objs):
+    """Return the profiles for users or profiles, skipping users without one."""
+    profiles = []
+    for obj in objs:
+        if not isinstance(obj, UserProfile):
+            try:
+                obj = obj.profile
+            except ObjectDoesNotExist:
+                continue
+        profiles.append(obj)
+    return profiles
+
+
+def prefetch_applications(profiles):
+    """
+    Fetch the applications for many profiles at once.
+
+    Accepts user profiles or users, and skips users without a profile.
+    The gm2m through rows are grouped by content type and each program
+    model is fetched with one in_bulk() query, rather than resolving the
+    targets one at a time. The results are attached to the profiles for
+    get_applications().
+    """
+    profiles = _user_profiles(profiles)
+    pids = {profile.pk: profile for profile in profiles}
+    for profile in profiles:
+        profile._applications = []
+    links = list(
+        UserProfile.applications.through.objects.filter(
+            gm2m_src__in=list(pids),
+        ).values_list('gm2m_src', 'gm2m_ct', 'gm2m_pk').order_by('-id'),
+    )
+    object_ids = {}
+    for pid, ct_id, oid in links:
+        object_ids.setdefault(ct_id, set()).add(int(oid))
+    objects = {}
+    for ct_id, oids in object_ids.items():
+        mod = ContentType.objects.get_for_id(ct_id).model_class()
+        for oid, app in mod.objects.in_bulk(oids).items():
+            objects[(ct_id, oid)] = app
+    for pid, ct_id, oid in links:
+        app = objects.get((ct_id, int(oid)))
+        if app:
+            pids[pid]._applications.append(app)
+    return profiles
+
+
+def prefetch_registrations(profiles):
+    """
+    Resolve the registrations for many profiles at once.
+
+    Accepts user profiles or users, and skips users without a profile. The
+    registration records are fetched with one query per registration type.
+    The results, including the profiles without a registration, are
+    memoized on the profiles for get_registration().
+    """
+    profiles = _user_profiles(profiles)
+    registrations = get_registrations(profiles)
+    for profile in profiles:
+        profile._registration = (
+            profile.registration_type, registrations.get(profile.user_id),
+        )
+    return profiles
+
+
+def prefetch_file_icons(instances):
+    """
+    Build the admin file icons for a page of objects in one pass.
+
+    Covers the file fields on the objects, on their rocket launch team and
+    on their user's UserFiles. The timestamps for the profile files, which
+    expire each grant cycle, come from file_timestamps() in bulk. The icons
+    are attached to the objects for admin_display_file().
+    """
+    entries = []
+    for instance in instances:
+        instance._file_icons = {}
+        for field in _file_fields(type(instance)):
+            entries.append((instance, getattr(instance, field), field, False))
+        team = getattr(instance, 'team', None)
+        if isinstance(team, models.Model):
+            for field in _file_fields(type(team)):
+                entries.append((instance, getattr(team, field), field, True))
+        try:
+            user_files = instance.user.user_files
+        except Exception:
+            continue
+        if user_files is not instance:
+            user_files._file_icons = {}
+            for field in USER_FILE_FIELDS:
+                entries.append(
+                    (user_files, getattr(user_files, field), field, False),
+                )
+    timestamps = file_timestamps([
+        attr.name for obj, attr, field, team in entries
+        if attr and field in USER_FILE_FIELDS
+    ])
+    start_date = get_start_date()
+    for obj, attr, field, team in entries:
+        valid = True
+        if attr and field in USER_FILE_FIELDS:
+            try:
+                valid = timestamps[attr.name] >= start_date
+            except Exception:
+                valid = False
+        obj._file_icons[(field, team)] = file_icon(attr, valid)
+    return instances
+
+
+def prefetch_emails_auxiliary(users):
+    """
+    Resolve the secondary emails for many users with one query.
+
+    Accepts users or user profiles and memoizes the addresses on the users
+    for get_email_auxiliary().
+    """
+    users = [getattr(obj, 'user', obj) for obj in users]
+    emails = get_emails_auxiliary([user.id for user in users])
+    for user in users:
+        user._email_auxiliary = emails.get(user.id)
+    return users
+
+
+class StoredFileManager(models.Manager):
+    """Write-through helpers for the StoredFile table."""
+
+    def record(self, name, timestamp, size=None, sha256=None):
+        """Store the metadata for the file name and refresh the cache."""
+        defaults = {'name': name, 'timestamp': timestamp}
+        if sha256:
+            defaults.update({'size': size, 'sha256': sha256})
+        self.update_or_create(
+            name_hash=self.model.get_name_hash(name),
+            defaults=defaults,
+        )
+        cache.set(self.model.get_cache_key(name), timestamp)
+
+
+class StoredFile(models.Model):
+    """Metadata for an uploaded file so that we need not stat the disk."""
+
+    name = models.CharField(max_length=768)
+    name_hash = models.CharField(max_length=40, unique=True)
+    timestamp = models.DateTimeField()
+    size = models.PositiveBigIntegerField(null=True, blank=True)
+    sha256 = models.CharField(max_length=64, null=True, blank=True, db_index=True)
+
+    objects = StoredFileManager()
+
+    class Meta:
+        """Attributes about the data model and admin options."""
+
+        db_table = 'core_storedfile'
+
+    def __str__(self):
+        """Default display value."""
+        return self.name
+
+    @staticmethod
+    def get_name_hash(name):
+        """Return the hash of the file name which we use as the lookup key."""
+        return hashlib.sha1(name.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_cache_key(name):
+        """Return the cache key for the timestamp of the file name."""
+        return 'file_timestamp_{0}'.format(StoredFile.get_name_hash(name))
+
+
+class FilesStatusManager(models.Manager):
+    """Helpers for keeping the FilesStatus table current."""
+
+    def refresh(self, user):
+        """Recompute the required files status for the user and store it."""
+        missing = missing_files(user)
+        files_status, created = self.update_or_create(
+            user=user,
+            defaults={
+                'status': not missing,
+                'missing': ','.join(missing),
+                'cycle_start': get_start_date(),
+            },
+        )
+        return files_status
+
+    def refresh_users(self, uids):
+        """Recompute the status for the users who have a profile."""
+        users = list(User.objects.filter(
+            pk__in=set(uids), profile__isnull=False,
+        ).select_related('profile', 'user_files'))
+        prefetch_applications(users)
+        for user in users:
+            self.refresh(user)
+
+    def refresh_application(self, app):
+        """Recompute the status for everyone related to the application."""
+        uids = UserProfile.applications.through.objects.filter(
+            gm2m_ct=ContentType.objects.get_for_model(app),
+            gm2m_pk=str(app.pk),
+        ).values_list('gm2m_src__user', flat=True)
+        self.refresh_users(list(uids) + [app.user_id])
+
+    def get_status(self, user):
+        """Return the stored status, recomputing it in a new grant cycle."""
+        try:
+            files_status = self.get(pk=user.id)
+        except self.model.DoesNotExist:
+            return self.refresh(user)
+        if files_status.cycle_start != get_start_date():
+            files_status = self.refresh(user)
+        return files_status
+
+
+class FilesStatus(models.Model):
+    """Required files status for a user, maintained by signals."""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='files_status',
+        editable=False,
+        on_delete=models.CASCADE,
+    )
+    date_updated = models.DateTimeField("Date Updated", auto_now=True)
+    status = models.BooleanField(default=False)
+    missing = models.TextField(
+        blank=True, help_text="Comma separated list of missing files",
+    )
+    cycle_start = models.DateTimeField(
+        help_text="Start date of the grant cycle when the status was computed",
+    )
+
+    objects = FilesStatusManager()
+
+    class Meta:
+        """Attributes about the data model and admin options."""
+
+        db_table = 'core_filesstatus'
+        verbose_name_plural = 'Files status'
+
+    def __str__(self):
+        """Default display value."""
+        return '{0}, {1}'.format(self.user.last_name, self.user.first_name)
+
+    def get_missing(self):
+        """Return the labels for the files that are missing."""
+        return [label for label in self.missing.split(',') if label]
+
+
+class ApplicationIndexManager(models.Manager):
+    """Helpers for keeping the ApplicationIndex table in sync."""
+
+    def sync_application(self, app):
+        """Index the application for everyone it is related to via gm2m."""
+        ct = ContentType.objects.get_for_model(app)
+        uids = set(
+            UserProfile.applications.through.objects.filter(
+                gm2m_ct=ct, gm2m_pk=str(app.pk),
+            ).values_list('gm2m_src__user', flat=True),
+        )
+        rows = self.filter(content_type=ct, object_id=app.pk)
+        rows.exclude(user__in=uids).delete()
+        values = {
+            'date_created': app.date_created,
+            'status': app.status,
+            'complete': app.complete,
+            'multi_year': app.multi_year(),
+        }
+        rows.update(**values)
+        uids -= set(rows.values_list('user', flat=True))
+        self.bulk_create([
+            self.model(user_id=uid, content_type=ct, object_id=app.pk, **values)
+            for uid in uids
+        ])
+
+    def get_applications(self, user, **filters):
+        """
+        Return the user's applications, newest first.
+
+        Keyword arguments filter the index rows in the database, e.g.
+        date_created__gte or status, so that only the applications that
+        pass are loaded: one indexed query for the index rows and one
+        query per content type for the applications themselves.
+        """
+        rows = list(
+            self.filter(user=user, **filters).order_by('-date_created', '-id'),
+        )
+        object_ids = {}
+        for row in rows:
+            object_ids.setdefault(row.content_type_id, []).append(row.object_id)
+        objects = {}
+        for ct_id, oids in object_ids.items():
+            mod = ContentType.objects.get_for_id(ct_id).model_class()
+            for oid, app in mod.objects.in_bulk(oids).items():
+                objects[(ct_id, oid)] = app
+        apps = []
+        for row in rows:
+            app = objects.get((row.content_type_id, row.object_id))
+            if app:
+                apps.append(app)
+        return apps
+
+
+class ApplicationIndex(models.Model):
+    """Concrete index of the applications related to each user."""
+
+    user = models.ForeignKey(
+        User,
+        related_name='application_index',
+        editable=False,
+        on_delete=models.CASCADE,
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    date_created = models.DateTimeField("Date Created")
+    status = models.BooleanField(default=False, verbose_name="Funded")
+    complete = models.BooleanField(default=False, verbose_name="Completed")
+    multi_year = models.BooleanField(default=False)
+
+    objects = ApplicationIndexManager()
+
+    class Meta:
+        """Attributes about the data model and admin options."""
+
+        db_table = 'core_applicationindex'
+        unique_together = ('user', 'content_type', 'object_id')
+        indexes = [
+            models.Index(fields=['user', 'date_created']),
+            models.Index(fields=['content_type', 'object_id']),
+        ]
+
+    def __str__(self):
+        """Default display value."""
+        return '{0}: {1}'.format(self.content_type.model, self.object_id)
+
+
+class UserNameIndexManager(models.Manager):
+    """Helpers for the name autocomplete."""
+
+    def sync(self, user):
+        """Store the normalized names for the user."""
+        self.update_or_create(
+            user=user,
+            defaults={
+                'first_name': normalize_name(user.first_name)[:150],
+                'last_name': normalize_name(user.last_name)[:150],
+            },
+        )
+
+    def search(self, term, limit):
+        """
+        Return the users whose names start with the term, best match first.
+
+        'smi' matches last or first names that start with 'smi'. Two or more
+        words, as in 'john smith' or 'smith, john', also match the last and
+        first names in either order. Exact last name matches rank above last
+        name prefixes, which rank above everything else.
+        """
+        prefix = normalize_name(term)
+        if not prefix:
+            return self.none()
+        query = Q(last_name__startswith=prefix)
+        query |= Q(first_name__startswith=prefix)
+        rank = Case(
+            When(last_name=prefix, then=Value(0)),
+            When(last_name__startswith=prefix, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+        words = prefix.split(' ', 1)
+        if len(words) == 2:
+            one, two = words
+            query |= Q(last_name__startswith=one, first_name__startswith=two)
+            query |= Q(first_name__startswith=one, last_name__startswith=two)
+        return self.filter(query).select_related('user').annotate(
+            rank=rank,
+        ).order_by('rank', 'last_name', 'first_name')[:limit]
+
+
+class UserNameIndex(models.Model):
+    """Normalized user names for the prefix searches of the autocomplete."""
+
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='name_index',
+        editable=False,
+        on_delete=models.CASCADE,
+    )
+    first_name = models.CharField(max_length=150, db_index=True)
+    last_name = models.CharField(max_length=150, db_index=True)
+
+    objects = UserNameIndexManager()
+
+    class Meta:
+        """Attributes about the data model and admin options."""
+
+        db_table = 'core_usernameindex'
+
+    def __str__(self):
+        """Default display value."""
+        return '{0}, {1}'.format(self.last_name, self.first_name)
+
+
+class OutboundMail(models.Model):
+    """Rendered email waiting in the outbox for bin/outbound_mail.py."""
+
+    date_created = models.DateTimeField("Date Created", auto_now_add=True)
+    date_sent = models.DateTimeField("Date Sent", null=True, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.TextField(help_text="Comma separated email addresses")
+    bcc = models.TextField(blank=True)
+    reply_to = models.TextField(blank=True)
+    status = models.CharField(
+        max_length=16,
+        choices=OUTBOUND_MAIL_STATUS,
+        default='queued',
+        db_index=True,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        """Attributes about the data model and admin options."""
+
+        db_table = 'core_outboundmail'
+        ordering = ['-date_created']
+        verbose_name_plural = 'Outbound mail'
+
+    def __str__(self):
+        """Default display value."""
+        return self.subject
+
+    @staticmethod
+    def join_addresses(addresses):
+        """Return the addresses as a comma separated string."""
+        return ','.join([address for address in addresses or [] if address])
+
+    @staticmethod
+    def split_addresses(addresses):
+        """Return the comma separated addresses as a list."""
+        return [address for address in addresses.split(',') if address]
+
+
+class ExportJob(models.Model):
+    """Admin export that runs outside of the request/response cycle."""
+
+    # meta
+    created_by = models.ForeignKey(
+        User,
+        verbose_name="Created by",
+        related_name='export_jobs',
+        editable=False,
+        on_delete=models.PROTECT,
+    )
+    date_created = models.DateTimeField("Date Created", auto_now_add=True)
+    date_updated = models.DateTimeField("Date Updated", auto_now=True)
+    # core
+    content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
+    object_ids = models.TextField(help_text="Comma separated primary keys")
+    action = models.CharField(max_length=32, choices=EXPORT_JOB_ACTIONS)
+    field = models.CharField(
+        "File name", max_length=64, null=True, blank=True,
+    )
+    status = models.CharField(
+        max_length=16, choices=EXPORT_JOB_STATUS, default='queued', db_index=True,
+    )
+    date_claimed = models.DateTimeField(
+        "Date Claimed", null=True, blank=True, editable=False,
+    )
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    phile = models.FileField("Export file", max_length=768, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        """Attributes about the data model and admin options."""
+
+        db_table = 'core_exportjob'
+        ordering = ['-date_created']
+
+    def __str__(self):
+        """Default display value."""
+        return '{0} ({1})'.format(
+            self.get_action_display(), self.content_type.model,
+        )
+
+    def get_object_ids(self):
+        """Return the primary keys of the objects to export."""
+        return [int(oid) for oid in self.object_ids.split(',') if oid]
+
+    def get_file_path(self):
+        """Return the path prefix for the export file."""
+        return 'files/exports/{0}'.format(secrets.token_urlsafe(32))
+
+    def get_absolute_url(self):
+        """Return the URL for downloading the export file."""
+        return reverse('export_job_download', args=(self.id,))
+
+
+@receiver(pre_save, dispatch_uid='core.stored_file_uploads')
+def stored_file_uploads(sender, instance, raw=False, **kwargs):
+    """Note which file fields carry a new upload before the model saves."""
+    fields = _file_fields(sender)
+    if fields and not raw:
+        instance._uploaded_files = [
+            attname for attname in fields
+            if getattr(instance, attname) and
+            not getattr(instance, attname)._committed
+        ]
+
+
+@receiver(post_save, dispatch_uid='core.stored_file_timestamps')
+def stored_file_timestamps(sender, instance, **kwargs):
+    """Record the upload time, size and hash for new files."""
+    uploaded = getattr(instance, '_uploaded_files', None)
+    if uploaded:
+        for attname in uploaded:
+            phile = getattr(instance, attname)
+            StoredFile.objects.record(
+                phile.name,
+                datetime.now(),
+                size=getattr(phile.file, 'size', None),
+                sha256=getattr(phile.file, 'sha256', None),
+            )
+        instance._uploaded_files = []
+
+
+@receiver(post_save, dispatch_uid='core.application_index_sync')
+def application_index_sync(sender, instance, raw=False, **kwargs):
+    """Keep the ApplicationIndex row current when an application changes."""
+    if not raw and isinstance(instance, BaseModel):
+        ApplicationIndex.objects.sync_application(instance)
+
+
+@receiver(post_delete, dispatch_uid='core.application_index_delete')
+def application_index_delete(sender, instance, **kwargs):
+    """Drop the ApplicationIndex rows for deleted applications and links."""
+    if isinstance(instance, BaseModel):
+        ApplicationIndex.objects.filter(
+            content_type=ContentType.objects.get_for_model(instance),
+            object_id=instance.pk,
+        ).delete()
+    elif sender is UserProfile.applications.through:
+        ApplicationIndex.objects.filter(
+            user__profile=instance.gm2m_src_id,
+            content_type=instance.gm2m_ct_id,
+            object_id=instance.gm2m_pk,
+        ).delete()
+
+
+@receiver(post_save, sender=GenericChoice, dispatch_uid='core.generic_choice_saved')
+@receiver(post_delete, sender=GenericChoice, dispatch_uid='core.generic_choice_deleted')
+@receiver(post_save, sender=Tag, dispatch_uid='core.generic_choice_tag_saved')
+@receiver(post_delete, sender=Tag, dispatch_uid='core.generic_choice_tag_deleted')
+@receiver(post_save, sender=TaggedItem, dispatch_uid='core.generic_choice_tagged')
+@receiver(post_delete, sender=TaggedItem, dispatch_uid='core.generic_choice_untagged')
+def generic_choices_invalidate(sender, **kwargs):
+    """Drop the cached choices when a choice or its tags change."""
+    GenericChoice.objects.invalidate()
+
+
+@receiver(post_save, sender=UserFiles, dispatch_uid='core.user_files_status')
+def user_files_status(sender, instance, raw=False, **kwargs):
+    """Recompute the required files status when profile files change."""
+    if not raw:
+        FilesStatus.objects.refresh_users([instance.user_id])
+
+
+@receiver(post_save, dispatch_uid='core.application_files_status')
+def application_files_status(sender, instance, raw=False, **kwargs):
+    """Recompute the required files status when an application changes."""
+    if not raw and isinstance(instance, BaseModel):
+        FilesStatus.objects.refresh_application(instance)
+
+
+@receiver(post_delete, dispatch_uid='core.applications_files_status')
+def applications_files_status(sender, instance, **kwargs):
+    """Recompute the status when an application is removed from a profile."""
+    if sender is UserProfile.applications.through:
+        FilesStatus.objects.refresh_users(
+            UserProfile.objects.filter(
+                pk=instance.gm2m_src_id,
+            ).values_list('user', flat=True),
+        )
+
+
+@receiver(post_save, sender=User, dispatch_uid='core.user_name_index')
+def user_name_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the normalized names current for the autocomplete."""
+    # logins only save last_login, which leaves the names alone
+    if update_fields and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    if not raw:
+        UserNameIndex.objects.sync(instance)
+
+
 @receiver(pre_save, sender=UserProfile)
 def notify_administrators(sender, **kwargs):
     """Send an email to  WSGC administrators of registration update."""
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+
+
+# application model name: model class, form class, uploads form class.
+# built once by CoreConfig.ready() so that views only do dictionary lookups.
+_applications = {}
+# content type ID: (content type, model class)
+_content_types = {}
+
+
+def populate():
+    """Build the application lookup table from the models and forms."""
+    from djspace.application import forms
+    for model in apps.get_app_config('application').get_models():
+        name = model._meta.model_name
+        _applications[name] = (
+            model,
+            getattr(forms, '{0}Form'.format(model.__name__), None),
+            forms.UPLOAD_FORMS.get(name),
+        )
+
+
+def get_content_type(ct_id):
+    """Return the content type and model class for a content type ID."""
+    ct_id = int(ct_id)
+    if ct_id not in _content_types:
+        # the IDs come from request parameters, so a miss costs one
+        # primary key lookup and unknown IDs raise DoesNotExist.
+        ct = ContentType.objects.get(pk=ct_id)
+        _content_types[ct_id] = (ct, ct.model_class())
+    return _content_types[ct_id]
+
+
+def _application(name):
+    """Return the table entry for a model name or URL slug."""
+    try:
+        return _applications[name.replace('-', '').lower()]
+    except KeyError:
+        raise LookupError(
+            "App 'application' doesn't have a '{0}' model.".format(name),
+        )
+
+
+def get_application_model(name):
+    """Return the application model for a model name or URL slug."""
+    return _application(name)[0]
+
+
+def get_application_form(name):
+    """Return the application form class for a model name or URL slug."""
+    return _application(name)[1]
+
+
+def get_upload_form(name):
+    """Return the uploads form class for a model name or URL slug."""
+    return _application(name)[2]
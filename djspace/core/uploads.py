@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import MemoryFileUploadHandler
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from djspace.core.validators import SNIFF_SIZE
+
+
+# content addressed blobs live here, relative to MEDIA_ROOT
+BLOB_DIR = 'files/blobs'
+
+
+def content_hash(content):
+    """Return the sha256 of a file, computed by the upload handler if we can."""
+    digest = getattr(content, 'sha256', None)
+    if not digest:
+        sha256 = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = sha256.hexdigest()
+    return digest
+
+
+def blob_name(digest):
+    """Return the name of the blob for a sha256 digest."""
+    return os.path.join(BLOB_DIR, digest[:2], digest[2:4], digest)
+
+
+class HashingUploadMixin(object):
+    """
+    Compute the sha256 of an upload while the chunks go by.
+
+    The leading bytes are kept as well, so that the validators can sniff
+    the file type without reading the upload back.
+    """
+
+    def new_file(self, *args, **kwargs):
+        """Start a fresh digest for every file in the request."""
+        self.sha256 = hashlib.sha256()
+        self.head = b''
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        """Feed the chunk to the digest before the handler stores it."""
+        self.sha256.update(raw_data)
+        if start < SNIFF_SIZE:
+            self.head += raw_data[:SNIFF_SIZE - start]
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        """Hang the digest and leading bytes on the uploaded file."""
+        phile = super().file_complete(file_size)
+        if phile is not None:
+            phile.sha256 = self.sha256.hexdigest()
+            phile.sniff_head = self.head
+        return phile
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    """Small uploads kept in memory, hashed on the way in."""
+
+
+class HashingTemporaryFileUploadHandler(
+    HashingUploadMixin, TemporaryFileUploadHandler,
+):
+    """Large uploads streamed to a temporary file, hashed on the way in."""
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps one copy of identical files.
+
+    The bytes are written once to a blob named by their sha256 and the
+    name that the model asked for becomes a hard link to that blob, so
+    URLs and paths do not change. File systems without hard links get a
+    plain copy. The links share the blob's mtime, so their upload times
+    come from the StoredFile table only. Fields opt in with storage=.
+    """
+
+    def _save(self, name, content):
+        """Link the name to the blob for the content, writing it if new."""
+        digest = content_hash(content)
+        content.sha256 = digest
+        directory = os.path.dirname(self.path(name))
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        blob = blob_name(digest)
+        try:
+            source = open(self.path(blob), 'rb')
+        except FileNotFoundError:
+            # large uploads are moved into the blob, so the content cannot
+            # be read again after this
+            blob = super()._save(blob, content)
+            source = open(self.path(blob), 'rb')
+        # the open blob keeps its bytes around even if the blob is removed
+        with File(source) as blob_file:
+            while True:
+                try:
+                    os.link(self.path(blob), self.path(name))
+                except FileExistsError:
+                    # someone else took the name in the meantime
+                    name = self.get_available_name(name)
+                except FileNotFoundError:
+                    # bin/file_blobs.py removed the blob in the meantime
+                    blob = super()._save(blob_name(digest), blob_file)
+                except OSError:
+                    return super()._save(name, blob_file)
+                else:
+                    return name
@@ -32,6 +32,12 @@ urlpatterns = [
         views.download_file,
         name='download_file',
     ),
+    # download the file from an admin export job
+    path(
+        'export-jobs/<int:jid>/download/',
+        views.export_job_download,
+        name='export_job_download',
+    ),
     # Update user files via ajax post
     path('account/user-files/', views.user_files, name='user_files'),
     # check files status
@@ -1,14 +1,32 @@
 # -*- coding: utf-8 -*-
 
+import gzip
+import mimetypes
 import os
+import re
 import secrets
+import tarfile
+import time
+import unicodedata
+from collections import namedtuple
 from datetime import datetime
+from operator import attrgetter
 
 from allauth.account.models import EmailAddress
+from django.apps import apps
 from django.conf import settings
+from django.db.models import Max
+from django.db.models import Subquery
 from django.forms.models import model_to_dict
+from django.http import FileResponse
+from django.http import Http404
+from django.http import HttpResponse
+from django.http import StreamingHttpResponse
+from django.template import loader
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header
+from django.utils.http import http_date
 from django.utils.safestring import mark_safe
-from djtools.utils.mail import send_mail
 
 
 PROFESSIONAL_PROGRAMS = [
@@ -49,15 +67,48 @@ CRL_REQUIRED_FILES = [
     'post_flight_performance_report',
     'proceeding_paper',
 ]
+# user profile files that have to be renewed each grant cycle
+USER_FILE_FIELDS = ('mugshot', 'biography', 'irs_w9')
+FILE_ICON_MISSING = '<i class="fa fa-times-circle red" aria-hidden="true"></i>'
+# number of objects fetched per database round trip by the exports
+EXPORT_CHUNK_SIZE = 250
+# size of the pieces read from disk when streaming a tarball
+TARBALL_CHUNK_SIZE = 64 * 1024
+# single byte range requested by a download client, e.g. bytes=500-999
+BYTE_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# start date and closing year of the current grant cycle, along with the
+# start of the next cycle, when the whole thing has to be rebuilt
+GrantCycle = namedtuple('GrantCycle', ('start', 'year', 'expires'))
+# per process copy of the current grant cycle
+_grant_cycle = {}
+
+
+def get_grant_cycle():
+    """
+    Obtain the current grant cycle.
+
+    Computed once per process and kept until the next grant cycle starts.
+    The year is the one the cycle ends in, which the application codes use.
+    """
+    now = datetime.now()
+    cycle = _grant_cycle.get('current')
+    if cycle is None or not cycle.start <= now < cycle.expires:
+        month = settings.GRANT_CYCLE_START_MES
+        year = now.year
+        if now.month < month:
+            year = now.year - 1
+        cycle = GrantCycle(
+            start=datetime(year, month, 1),
+            year=year + 1,
+            expires=datetime(year + 1, month, 1),
+        )
+        _grant_cycle['current'] = cycle
+    return cycle
 
 
 def get_start_date():
     """Obtain the start date for the current grant cycle."""
-    now = datetime.now()
-    year = now.year
-    if now.month < settings.GRANT_CYCLE_START_MES:
-        year = now.year - 1
-    return datetime(year, settings.GRANT_CYCLE_START_MES, 1)
+    return get_grant_cycle().start
 
 
 def upload_to_path(field_name, instance, filename):
@@ -75,11 +126,17 @@ def upload_to_path(field_name, instance, filename):
     return os.path.join(path, filename)
 
 
-def files_status(user):
-    """Determine if the user file is valid for the current grant cycle."""
-    status = True
+def missing_files(user):
+    """
+    Determine which required files the user has yet to provide.
+
+    Returns a list of labels: 'userfiles' when the UserFiles() instance
+    does not exist, 'userfiles.<field>' for profile files and
+    '<model>.<id>.<field>' for application files.
+    """
+    missing = []
     # fetch all user application submissions
-    apps = user.profile.applications.all()
+    apps = user.profile.get_applications()
     # First Nations Competition exception
     fnl = False
     for ap in apps:
@@ -89,53 +146,59 @@ def files_status(user):
     # ignore FNL altogether for user files:
     # bio, mugshot, media release, w9
     if not fnl:
+        start_date = get_start_date()
         try:
             files = user.user_files
             files_dict = model_to_dict(files)
         except Exception:
             # UserFiles() instance does not exist
-            return False
+            files_dict = {}
+            missing.append('userfiles')
         for key, valu in files_dict.items():
             if key != 'id':
-                if not valu:
-                    return False
                 # have to be renewed every year
-                if not files.status(key):
-                    return False
+                if not valu or not files.status(key, start_date):
+                    missing.append('userfiles.{0}'.format(key))
 
     # check for application files
     for app in apps:
         if app.status:
             app_dict = model_to_dict(app)
+            # program specific
+            mod = app.get_content_type().model
+            fields = []
 
             # all programs except FNL
             if not app.award_acceptance and not fnl:
-                return False
+                fields.append('award_acceptance')
 
-            # program specific
-            mod = app.get_content_type().model
             # professional programs
             if mod in PROFESSIONAL_PROGRAMS:
                 if not app_dict['close_out_finance_document']:
-                    return False
+                    fields.append('close_out_finance_document')
 
             # rocket launch team files
             # (not very elegant but waiting on new data model)
             if mod == 'rocketlaunchteam':
                 if app.competition == 'Collegiate Rocket Competition':
-                    for cfield in CRL_REQUIRED_FILES:
-                        if not getattr(app, cfield):
-                            return False
+                    required = CRL_REQUIRED_FILES
                 elif app.competition == 'Midwest High Powered Rocket Competition':
-                    for mfield in MRL_REQUIRED_FILES:
-                        if not getattr(app, mfield):
-                            return False
+                    required = MRL_REQUIRED_FILES
                 else:
-                    for ffield in FNL_REQUIRED_FILES:
-                        if not getattr(app, ffield):
-                            return False
+                    required = FNL_REQUIRED_FILES
+                for rfield in required:
+                    if not getattr(app, rfield):
+                        fields.append(rfield)
 
-    return status
+            for field in fields:
+                missing.append('{0}.{1}.{2}'.format(mod, app.id, field))
+
+    return missing
+
+
+def files_status(user):
+    """Determine if the user file is valid for the current grant cycle."""
+    return not missing_files(user)
 
 
 def profile_status(user):
@@ -154,6 +217,29 @@ def profile_status(user):
     return status
 
 
+def queue_mail(
+    request, recipients, subject, femail, template, data, bcc=None, reply_to=None,
+):
+    """
+    Render the email now and leave it in the outbox for bin/outbound_mail.py.
+
+    Takes the same arguments as djtools.utils.mail.send_mail() so that the
+    request does not have to wait on the mail provider.
+    """
+    # this import needs to be here, rather than at the top with the others
+    from djspace.core.models import OutboundMail
+
+    body = loader.render_to_string(template, {'data': data}, request)
+    return OutboundMail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=femail,
+        recipients=OutboundMail.join_addresses(recipients),
+        bcc=OutboundMail.join_addresses(bcc),
+        reply_to=OutboundMail.join_addresses(reply_to),
+    )
+
+
 def registration_notify(request, action, user):
     """Send an email when a new registration comes in."""
     subject = "[WSGC Profile Registration: {0}D] {1}, {2}".format(
@@ -171,7 +257,7 @@ def registration_notify(request, action, user):
         'media_url': settings.MEDIA_URL,
     }
     frum = user.email
-    send_mail(
+    queue_mail(
         request,
         to_list,
         subject,
@@ -183,6 +269,28 @@ def registration_notify(request, action, user):
     )
 
 
+def normalize_name(name):
+    """Lowercase the name and strip accents and punctuation for searching."""
+    name = unicodedata.normalize('NFKD', name or '').lower()
+    name = ''.join([
+        char for char in name if char.isalnum() or char.isspace()
+    ])
+    return ' '.join(name.split())
+
+
+def field_accessor(field):
+    """
+    Return a callable that reads the field from a model instance.
+
+    Plain columns get an attrgetter, relations fall back to None when the
+    related object does not exist, the same as getattr() with a default.
+    """
+    if field.concrete and not field.is_relation:
+        return attrgetter(field.name)
+    name = field.name
+    return lambda obj: getattr(obj, name, None)
+
+
 def get_term(date):
     """Obtain the current term for the grant cycle."""
     term = 'SP'
@@ -192,45 +300,276 @@ def get_term(date):
 
 
 def get_email_auxiliary(user):
-    """Fetch the secondary email address for the user."""
-    return EmailAddress.objects.filter(user=user).filter(
-        primary=False,
-    ).order_by('-id').first()
+    """Fetch the secondary email address for the user, memoized on the user."""
+    if not hasattr(user, '_email_auxiliary'):
+        user._email_auxiliary = get_emails_auxiliary([user.id]).get(user.id)
+    return user._email_auxiliary
+
+
+def get_emails_auxiliary(uids):
+    """
+    Fetch the latest secondary email for each user in one grouped query.
+
+    Returns a dictionary of EmailAddress objects keyed by user ID.
+    """
+    latest = EmailAddress.objects.filter(
+        user__in=uids, primary=False,
+    ).values('user').annotate(latest=Max('id')).values('latest')
+    return {
+        address.user_id: address
+        for address in EmailAddress.objects.filter(pk__in=Subquery(latest))
+    }
+
+
+def get_registrations(profiles):
+    """Fetch the registration objects for the profiles, one query per type."""
+    reg_types = {}
+    for profile in profiles:
+        if profile.registration_type:
+            reg_types.setdefault(profile.registration_type, []).append(
+                profile.user_id,
+            )
+    registrations = {}
+    for reg_type, uids in reg_types.items():
+        try:
+            mod = apps.get_model(app_label='registration', model_name=reg_type)
+        except LookupError:
+            continue
+        regs = mod.objects.filter(user__in=uids)
+        if 'wsgc_affiliate' in {field.name for field in mod._meta.get_fields()}:
+            regs = regs.select_related('wsgc_affiliate')
+        for reg in regs:
+            registrations[reg.user_id] = reg
+    return registrations
+
+
+def file_icon(attr, valid=True):
+    """Return the admin icon for a file, a link when it is present and valid."""
+    if attr and valid:
+        return mark_safe(
+            """<a href="{0}" target="_blank">
+            <i class="fa fa-check green" aria-hidden="true"></i></a>
+            """.format(attr.url),
+        )
+    return mark_safe(FILE_ICON_MISSING)
 
 
 def admin_display_file(instance, field, team=False):
     """Display the proper icon on the admin dashboard for the file."""
-    status = False
+    # icons built for a page of results by prefetch_file_icons()
+    icons = getattr(instance, '_file_icons', None)
+    if icons and (field, team) in icons:
+        return icons[(field, team)]
     if team:
         attr = getattr(instance.team, field)
     else:
         attr = getattr(instance, field)
+    valid = True
     # user profile files expire each grant cycle
-    if attr and field in {'mugshot', 'biography', 'irs_w9'}:
-        status = instance.user.user_files.status(field)
-        if status:
-            icon = mark_safe(
-                """<a href="{0}" target="_blank">
-                <i class="fa fa-check green" aria-hidden="true"></i></a>
-                """.format(attr.url),
+    if attr and field in USER_FILE_FIELDS:
+        valid = instance.user.user_files.status(field)
+    return file_icon(attr, valid)
+
+
+class Echo(object):
+    """Pseudo buffer that hands back what the csv writer writes to it."""
+
+    def write(self, value):
+        """Return the value rather than storing it."""
+        return value
+
+
+def queryset_chunks(queryset, size):
+    """Read the queryset with a server side cursor and yield lists of rows."""
+    chunk = []
+    for obj in queryset.iterator(chunk_size=size):
+        chunk.append(obj)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class TarballBuffer(object):
+    """File-like sink that holds compressed bytes until they are drained."""
+
+    def __init__(self):
+        """Start with nothing buffered."""
+        self.chunks = []
+
+    def write(self, data):
+        """Keep the bytes that the gzip stream hands us."""
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        """Nothing to flush, the data is drained by the generator."""
+
+    def drain(self):
+        """Return and forget everything written so far."""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def tarball_stream(files):
+    """
+    Generate a gzipped tarball from (path, arcname) pairs, piece by piece.
+
+    The tar headers and file contents are compressed in chunks of
+    TARBALL_CHUNK_SIZE and the compressed bytes are handed back as soon as
+    they are available, so memory use does not depend on the size of the
+    archive. Files that are missing on disk are skipped.
+    """
+    buffy = TarballBuffer()
+    gz = gzip.GzipFile(fileobj=buffy, mode='wb')
+    offset = 0
+    for path, arcname in files:
+        try:
+            phile = open(path, 'rb')
+        except OSError:
+            continue
+        with phile:
+            stat = os.fstat(phile.fileno())
+            tarinfo = tarfile.TarInfo(arcname)
+            tarinfo.size = stat.st_size
+            tarinfo.mtime = stat.st_mtime
+            tarinfo.mode = stat.st_mode & 0o7777
+            header = tarinfo.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+            gz.write(header)
+            offset += len(header)
+            remaining = tarinfo.size
+            while remaining > 0:
+                data = phile.read(min(TARBALL_CHUNK_SIZE, remaining))
+                if not data:
+                    # file shrank after we read its size, pad it out
+                    data = tarfile.NUL * min(TARBALL_CHUNK_SIZE, remaining)
+                gz.write(data)
+                remaining -= len(data)
+                yield buffy.drain()
+        blocks, rest = divmod(tarinfo.size, tarfile.BLOCKSIZE)
+        if rest:
+            gz.write(tarfile.NUL * (tarfile.BLOCKSIZE - rest))
+            blocks += 1
+        offset += blocks * tarfile.BLOCKSIZE
+    # end of archive marker followed by padding to a full record
+    gz.write(tarfile.NUL * (tarfile.BLOCKSIZE * 2))
+    offset += tarfile.BLOCKSIZE * 2
+    blocks, rest = divmod(offset, tarfile.RECORDSIZE)
+    if rest:
+        gz.write(tarfile.NUL * (tarfile.RECORDSIZE - rest))
+    gz.close()
+    yield buffy.drain()
+
+
+def byte_range(header, size):
+    """
+    Parse a Range header against a file of the given size.
+
+    Returns a (start, end) pair for a single satisfiable range, False when
+    the range starts beyond the end of the file, and None for anything we
+    do not handle (e.g. multiple ranges) or that is not a valid range
+    (e.g. bytes=5-3), which is served in full.
+    """
+    match = BYTE_RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+        # an invalid range is ignored rather than unsatisfiable
+        return None
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        return None
+    if start > end:
+        return False
+    return start, end
+
+
+def file_range(phile, start, length):
+    """Generate length bytes of an open file from start, then close it."""
+    try:
+        phile.seek(start)
+        while length > 0:
+            data = phile.read(min(TARBALL_CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        phile.close()
+
+
+def serve_file(request, name, filename, last_modified=None):
+    """
+    Serve a file under MEDIA_ROOT as an attachment named filename.
+
+    When DOWNLOAD_OFFLOAD_HEADER is set the web server sends the bytes.
+    Otherwise the file is streamed from disk with support for conditional
+    GET and single byte ranges. The ETag and Last-Modified headers come
+    from last_modified (the stored upload timestamp) when it is given.
+    Raises Http404 when the file is not on disk.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if settings.DOWNLOAD_OFFLOAD_HEADER:
+        response = HttpResponse(content_type=content_type)
+        response[settings.DOWNLOAD_OFFLOAD_HEADER] = '{0}{1}'.format(
+            settings.DOWNLOAD_OFFLOAD_ROOT, name,
+        )
+        response['Content-Disposition'] = content_disposition_header(
+            True, filename,
+        )
+        return response
+    try:
+        size = os.path.getsize(path)
+    except FileNotFoundError:
+        raise Http404("File not found.")
+    if isinstance(last_modified, datetime):
+        mtime = int(time.mktime(last_modified.timetuple()))
+    else:
+        mtime = int(os.path.getmtime(path))
+    etag = '"{0:x}-{1:x}"'.format(mtime, size)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=mtime,
+    )
+    if response is None:
+        byte_span = None
+        header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if header and (not if_range or if_range in {etag, http_date(mtime)}):
+            byte_span = byte_range(header, size)
+        if byte_span is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{0}'.format(size)
+        elif byte_span:
+            start, end = byte_span
+            response = StreamingHttpResponse(
+                file_range(open(path, 'rb'), start, end - start + 1),
+                status=206,
+                content_type=content_type,
             )
-        else:
-            icon = mark_safe('<i class="fa fa-times-circle red" aria-hidden="true"></i>')
-    elif team:
-        if attr:
-            icon = mark_safe(
-                """<a href="{0}" target="_blank">
-                <i class="fa fa-check green" aria-hidden="true"></i></a>
-                """.format(attr.url),
+            response['Content-Range'] = 'bytes {0}-{1}/{2}'.format(
+                start, end, size,
+            )
+            response['Content-Length'] = end - start + 1
+            response['Content-Disposition'] = content_disposition_header(
+                True, filename,
             )
         else:
-            icon = mark_safe('<i class="fa fa-times-circle red" aria-hidden="true"></i>')
-    elif attr:
-        icon = mark_safe(
-            """<a href="{0}" target="_blank">
-            <i class="fa fa-check green" aria-hidden="true"></i></a>
-            """.format(attr.url),
-        )
-    else:
-        icon = mark_safe('<i class="fa fa-times-circle red" aria-hidden="true"></i>')
-    return icon
+            response = FileResponse(
+                open(path, 'rb'),
+                as_attachment=True,
+                filename=filename,
+                content_type=content_type,
+            )
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    return response
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+from django.core.exceptions import ValidationError
+from django.utils.deconstruct import deconstructible
+
+
+# how much of the upload we read to work out what it is
+SNIFF_SIZE = 8 * 1024
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# leading bytes and the mime type they identify, checked in order
+MAGIC_NUMBERS = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'<?xml', 'text/xml'),
+    (b'<RockSimDocument', 'text/xml'),
+)
+# office open xml documents are zip files, the part names tell them apart
+ZIP_MAGIC = b'PK\x03\x04'
+ZIP_PARTS = (
+    (b'xl/', XLSX_MIMETYPE),
+    (b'ppt/', PPTX_MIMETYPE),
+)
+
+
+def sniff_mimetype(phile):
+    """
+    Return the mime type of a file from its magic number.
+
+    The first SNIFF_SIZE bytes are read once and the answer is kept on
+    the upload, so every validator on the field shares it. The upload
+    handlers hand us those bytes up front, otherwise we read and rewind.
+    """
+    upload = getattr(phile, 'file', phile)
+    mimetype = getattr(upload, 'sniffed_mimetype', None)
+    if mimetype is None:
+        head = getattr(upload, 'sniff_head', None)
+        if head is None:
+            upload.seek(0)
+            head = upload.read(SNIFF_SIZE)
+            upload.seek(0)
+        mimetype = 'application/octet-stream'
+        if head.startswith(ZIP_MAGIC):
+            mimetype = 'application/zip'
+            for part, zip_mimetype in ZIP_PARTS:
+                if part in head:
+                    mimetype = zip_mimetype
+                    break
+        else:
+            for magic, magic_mimetype in MAGIC_NUMBERS:
+                if head.startswith(magic):
+                    mimetype = magic_mimetype
+                    break
+        upload.sniffed_mimetype = mimetype
+    return mimetype
+
+
+@deconstructible
+class MagicValidator(object):
+    """Validate the type of an upload from its leading bytes."""
+
+    message = "Unsupported file type."
+    code = 'invalid_mimetype'
+
+    def __init__(self, *mimetypes):
+        """Keep the mime types that are allowed."""
+        self.mimetypes = mimetypes
+
+    def __call__(self, value):
+        """Raise a ValidationError if the new upload is not an allowed type."""
+        # stored files were checked when they were uploaded
+        if getattr(value, '_committed', False):
+            return
+        if sniff_mimetype(value) not in self.mimetypes:
+            raise ValidationError(self.message, code=self.code)
+
+    def __eq__(self, other):
+        """Validators with the same mime types are interchangeable."""
+        return (
+            isinstance(other, MagicValidator) and
+            self.mimetypes == other.mimetypes
+        )
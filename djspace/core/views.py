@@ -1,26 +1,29 @@
 # -*- coding: utf-8 -*-
 
-import mimetypes
-import os
-
-
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.contrib.contenttypes.models import ContentType
+from django.http import Http404
 from django.http import HttpResponse
 from django.http import HttpResponseRedirect
+from django.shortcuts import get_object_or_404
 from django.shortcuts import render
+from django.template import loader
 from django.views.decorators.csrf import csrf_exempt
 from djspace.application.models import *
 from djspace.core.forms import EmailApplicantsForm
 from djspace.core.forms import PhotoForm
 from djspace.core.forms import UserFilesForm
+from djspace.core.models import ExportJob
+from djspace.core.models import FilesStatus
+from djspace.core.models import OutboundMail
 from djspace.core.models import UserFiles
-from djspace.core.utils import files_status
-from djspace.dashboard.views import UPLOAD_FORMS
-from djtools.utils.mail import send_mail
+from djspace.core.models import file_timestamp
+from djspace.core.resolver import get_content_type
+from djspace.core.resolver import get_upload_form
+from djspace.core.utils import queue_mail
+from djspace.core.utils import serve_file
 
 
 @staff_member_required
@@ -33,34 +36,65 @@ def sendmail(request):
         form.is_valid()
         cd = form.cleaned_data
         # content type
-        ct = ContentType.objects.get_for_id(cd['content_type'])
+        ct, mod = get_content_type(cd['content_type'])
         # program ids
         pids = request.POST.getlist('pids[]')
         # email subject
         sub = "WSGC: Information about your {0} application".format(
             cd['title'],
         )
-        bcc = [request.user.email, settings.SERVER_MAIL]
+        bcc = OutboundMail.join_addresses(
+            [request.user.email, settings.SERVER_MAIL],
+        )
+        frum = settings.SERVER_EMAIL
+        # fetch all of the applications and their users in one query
+        # and compile the template once for all of the recipients
+        instances = mod.objects.select_related(
+            'user', 'user__profile',
+        ).in_bulk([int(pid) for pid in pids])
+        template = loader.get_template('admin/email_data.html')
+        mail = []
+        failed = []
         for pid in pids:
-            instance = ct.get_object_for_this_type(pk=pid)
-            to = [instance.user.email]
-            frum = settings.SERVER_EMAIL
-            send_mail(
-                request,
-                to,
-                sub,
-                frum,
-                'admin/email_data.html',
-                {'obj': instance, 'content': cd.get('content')},
-                reply_to=[frum,],
+            instance = instances.get(int(pid))
+            if not instance:
+                failed.append('{0}: not found'.format(pid))
+                continue
+            try:
+                body = template.render(
+                    {'data': {'obj': instance, 'content': cd.get('content')}},
+                    request,
+                )
+            except Exception as error:
+                failed.append('{0}: {1}'.format(instance.user.email, error))
+                continue
+            mail.append(OutboundMail(
+                subject=sub,
+                body=body,
+                from_email=frum,
+                recipients=instance.user.email,
                 bcc=bcc,
+                reply_to=frum,
+            ))
+        OutboundMail.objects.bulk_create(mail)
+        if mail:
+            messages.add_message(
+                request,
+                messages.SUCCESS,
+                'Your message was queued for delivery to {0} recipients.'.format(
+                    len(mail),
+                ),
+                extra_tags='success',
+            )
+        if failed:
+            messages.add_message(
+                request,
+                messages.WARNING,
+                'Your message could not be queued for: {0}'.format(
+                    '; '.join(failed),
+                ),
+                extra_tags='warning',
             )
-        messages.add_message(
-            request,
-            messages.SUCCESS,
-            'Your message was sent successfully.',
-            extra_tags='success',
-        )
 
     return HttpResponseRedirect(redirect)
 
@@ -78,8 +112,7 @@ def photo_upload(request):
             ct = request.POST.get('content_type')
             oid = request.POST.get('oid')
             if ct and oid:
-                ct = ContentType.objects.get(pk=ct)
-                mod = ct.model_class()
+                ct, mod = get_content_type(ct)
                 try:
                     instance = mod.objects.get(pk=oid)
                     phile = form.save(commit=False)
@@ -114,8 +147,7 @@ def user_files(request):
     if request.method == 'POST':
         ct = request.POST.get('content_type')
         if ct:
-            ct = ContentType.objects.get(pk=ct)
-            mod = ct.model_class()
+            ct, mod = get_content_type(ct)
             instance = mod.objects.get(pk=request.POST.get('oid'))
             # team leaders, co-advisors, and grants officers can upload files
             # for rocket launch teams and professional programs
@@ -155,7 +187,7 @@ def user_files(request):
                     content_type='text/plain; charset=utf-8',
                 )
             else:
-                form = UPLOAD_FORMS[ct.model](
+                form = get_upload_form(ct.model)(
                     data=request.POST,
                     files=request.FILES,
                     instance=instance,
@@ -198,7 +230,7 @@ def user_files(request):
                 bcc = [settings.SERVER_MAIL]
                 # set up CC for WSGC folks for specific programs
                 frum = user.email
-                send_mail(
+                queue_mail(
                     request,
                     to,
                     subject,
@@ -243,7 +275,7 @@ def check_files_status(request):
     Return: True or False
     """
     if request.method == 'POST':
-        status = files_status(request.user)
+        status = FilesStatus.objects.get_status(request.user).status
     else:
         status = "POST required"
 
@@ -258,24 +290,32 @@ def download_file(request, field, ct, oid, uid):
         'biography': 'Bio',
         'irs_w9': 'W9',
     }
-    lackey = None
-    if request.GET.get('lackey'):
-        lackey = request.GET['lackey']
-    user = User.objects.get(pk=uid)
-    attr = getattr(user.user_files, field, None)
-    path = os.path.join(settings.MEDIA_ROOT, attr.name)
-    extension = path.split('.')[-1]
-    ct = ContentType.objects.get(pk=ct)
-    mod = ct.model_class()
-    instance = mod.objects.get(pk=oid)
+    if field not in files:
+        raise Http404
+    lackey = request.GET.get('lackey') or None
+    user_files = get_object_or_404(
+        UserFiles.objects.only('user', field), user_id=uid,
+    )
+    attr = getattr(user_files, field, None)
+    if not attr:
+        raise Http404
+    _, mod = get_content_type(ct)
+    instance = get_object_or_404(mod.objects.select_related('user'), pk=oid)
     filename = '{0}_{1}.{2}'.format(
-        instance.get_file_name(lackey=lackey), files[field], extension,
+        instance.get_file_name(lackey=lackey),
+        files[field],
+        attr.name.split('.')[-1],
+    )
+    return serve_file(request, attr.name, filename, file_timestamp(attr.name))
+
+
+@staff_member_required
+def export_job_download(request, jid):
+    """Download the file that an export job created."""
+    job = get_object_or_404(ExportJob, pk=jid, status='complete')
+    return serve_file(
+        request, job.phile.name, job.phile.name.split('/')[-1],
     )
-    with open(path, 'rb') as phile:
-        mime_type, _ = mimetypes.guess_type(path)
-        response = HttpResponse(phile, content_type=mime_type)
-        response['Content-Disposition'] = 'attachment; filename={0}'.format(filename)
-    return response
 
 
 @csrf_exempt
@@ -285,10 +325,9 @@ def user_files_test(request):
     if request.method == 'POST':
         valid = 'no'
         ct = request.POST.get('ct')
-        ct = ContentType.objects.get(pk=ct)
-        mod = ct.model_class()
+        ct, mod = get_content_type(ct)
         instance = mod.objects.get(pk=request.POST.get('oid'))
-        form = UPLOAD_FORMS[ct.model](
+        form = get_upload_form(ct.model)(
             data=request.POST,
             files=request.FILES,
             instance=instance,
@@ -301,10 +340,9 @@ def user_files_test(request):
             valid = form.errors
     else:
         ct = request.GET.get('ct')
-        ct = ContentType.objects.get(pk=ct)
-        mod = ct.model_class()
+        ct, mod = get_content_type(ct)
         instance = mod.objects.get(pk=request.GET.get('oid'))
-        form = UPLOAD_FORMS[ct.model](
+        form = get_upload_form(ct.model)(
             instance=instance, use_required_attribute=False,
         )
     return render(
@@ -324,8 +362,7 @@ def object_delete(request):
             # content type ID
             cid = int(request.POST.get('cid'))
             try:
-                ct = ContentType.objects.get(pk=cid)
-                mod = ct.model_class()
+                ct, mod = get_content_type(cid)
                 try:
                     instance = mod.objects.get(pk=oid)
                     if ct.model == 'photo':
@@ -13,9 +13,6 @@ from djtools.fields import STATE_CHOICES
 from djtools.fields.localflavor import USPhoneNumberField
 
 
-RACES = GenericChoice.objects.filter(tags__name__in=['Race']).order_by('name')
-
-
 class UserForm(forms.Form):
     """Django User data plus salutation and second_name from profile."""
 
@@ -37,6 +34,13 @@ class UserForm(forms.Form):
 class UserProfileForm(forms.ModelForm):
     """User profile data."""
 
+    def __init__(self, *args, **kwargs):
+        """Override the initialization method to set race choices."""
+        super(UserProfileForm, self).__init__(*args, **kwargs)
+        self.fields['race'].queryset = GenericChoice.objects.tagged(
+            ['Race'], order_by=('name',),
+        )
+
     registration_type = forms.CharField(
         max_length=32,
         widget=forms.Select(choices=REG_TYPE),
@@ -50,7 +54,7 @@ class UserProfileForm(forms.ModelForm):
     )
     race = forms.ModelMultipleChoiceField(
         label="Race and Ethnicity",
-        queryset=RACES,
+        queryset=GenericChoice.objects.none(),
         help_text='Check all that apply',
         widget=forms.CheckboxSelectMultiple(),
     )
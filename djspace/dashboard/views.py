@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 
+import hashlib
 import json
 
 import django
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q
+from django.core.cache import cache
 from django.forms.models import model_to_dict
 from django.http import Http404
 from django.http import HttpResponse
@@ -19,9 +20,13 @@ from django.views.decorators.csrf import csrf_exempt
 from djspace.application.forms import *
 from djspace.application.models import ROCKET_COMPETITIONS_EXCLUDE
 from djspace.core.forms import UserFilesForm
+from djspace.core.models import ApplicationIndex
 from djspace.core.models import UserFiles
+from djspace.core.models import UserNameIndex
+from djspace.core.resolver import get_content_type
 from djspace.core.utils import PROFESSIONAL_PROGRAMS
 from djspace.core.utils import get_start_date
+from djspace.core.utils import normalize_name
 from djspace.core.utils import profile_status
 from djspace.dashboard.forms import UserForm
 from djspace.dashboard.forms import UserProfileForm
@@ -35,31 +40,6 @@ from djspace.registration.forms import UndergraduateForm
 from djtools.utils.convert import str_to_class
 
 
-UPLOAD_FORMS = {
-    'highereducationinitiatives': HigherEducationInitiativesUploadsForm,
-    'earlystageinvestigator': EarlyStageInvestigatorUploadsForm,
-    'researchinfrastructure': ResearchInfrastructureUploadsForm,
-    'aerospaceoutreach': AerospaceOutreachUploadsForm,
-    'specialinitiatives': SpecialInitiativesUploadsForm,
-    'undergraduatescholarship': UndergraduateScholarshipUploadsForm,
-    'stembridgescholarship': StemBridgeScholarshipUploadsForm,
-    'womeninaviationscholarship': WomenInAviationScholarshipUploadsForm,
-    'undergraduateresearch': UndergraduateResearchUploadsForm,
-    'graduatefellowship': GraduateFellowshipUploadsForm,
-    'clarkgraduatefellowship': ClarkGraduateFellowshipUploadsForm,
-    'undergraduateaerospacedesignresearchscholarship': UndergraduateAerospaceDesignResearchScholarshipUploadsForm,
-    'rocketlaunchteam': RocketLaunchTeamUploadsForm,
-    'firstnationsrocketcompetition': FirstNationsRocketCompetitionUploadsForm,
-    'midwesthighpoweredrocketcompetition': MidwestHighPoweredRocketCompetitionUploadsForm,
-    'collegiaterocketcompetition': CollegiateRocketCompetitionUploadsForm,
-    'nasacompetition': NasaCompetitionUploadsForm,
-    'otherprogram': OtherProgramUploadsForm,
-    'industryinternship': IndustryInternshipUploadsForm,
-    'professionalprogramstudent': ProfessionalProgramStudentUploadsForm,
-    'unmannedaerialvehiclesresearchscholarship': UnmannedAerialVehiclesResearchScholarshipUploadsForm,
-}
-
-
 @login_required
 def home(request):
     """User dashboard home."""
@@ -82,33 +62,24 @@ def home(request):
     except Exception:
         reg = None
 
-    # if the user does not have any applications, the gm2m
-    # field will throw an error at apps.all()
-    try:
-        apps = user.profile.applications
-        # current grant cycle applications
-        current_apps = []
-        # current approved
-        approved = []
-        # past grant cycle applications
-        past_apps = []
-        start_date = get_start_date()
-        for app in apps.all().order_by('-id'):
-            if app.date_created >= start_date:
-                current_apps.append(app)
-                if app.status:
-                    approved.append(app)
-            elif app.multi_year and app.status:
-                past_apps.append(app)
-    except Exception:
-        apps = None
+    start_date = get_start_date()
+    # current grant cycle applications
+    current_apps = ApplicationIndex.objects.get_applications(
+        user, date_created__gte=start_date,
+    )
+    # current approved
+    approved = [app for app in current_apps if app.status]
+    # past grant cycle applications that are funded for more than one year
+    past_apps = ApplicationIndex.objects.get_applications(
+        user, date_created__lt=start_date, status=True, multi_year=True,
+    )
 
     status = profile_status(user)
 
     if files:
-        mugshot_status = files.status('mugshot')
-        biography_status = files.status('biography')
-        irs_w9_status = files.status('irs_w9')
+        mugshot_status = files.status('mugshot', start_date)
+        biography_status = files.status('biography', start_date)
+        irs_w9_status = files.status('irs_w9', start_date)
 
     return render(
         request, 'dashboard/home.html', {
@@ -138,21 +109,23 @@ def home(request):
 @login_required
 def get_users(request):
     """AJAX GET for retrieving users via auto-complete."""
-    query = request.GET.get('term', '')
-
-    users = User.objects.filter(
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query),
-    ).order_by('last_name')
+    term = normalize_name(request.GET.get('term', ''))
+    if len(term) < settings.AUTOCOMPLETE_MIN_LENGTH:
+        return HttpResponse('[]', content_type='application/json; charset=utf-8')
 
-    auto_complete = []
-    for user in users:
-        user_json = {}
-        name = "{0}, {1}".format(user.last_name, user.first_name)
-        user_json['id'] = user.id
-        user_json['label'] = name
-        user_json['value'] = name
-        auto_complete.append(user_json)
+    key = 'get_users_{0}'.format(hashlib.sha1(term.encode('utf-8')).hexdigest())
+    auto_complete = cache.get(key)
+    if auto_complete is None:
+        auto_complete = []
+        names = UserNameIndex.objects.search(term, settings.AUTOCOMPLETE_LIMIT)
+        for name in names:
+            user_json = {}
+            label = "{0}, {1}".format(name.user.last_name, name.user.first_name)
+            user_json['id'] = name.user_id
+            user_json['label'] = label
+            user_json['value'] = label
+            auto_complete.append(user_json)
+        cache.set(key, auto_complete, settings.AUTOCOMPLETE_CACHE_TIMEOUT)
 
     return HttpResponse(
         json.dumps(auto_complete),
@@ -336,8 +309,7 @@ def set_val(request):
         instance_value = request.POST.get('value')
 
         try:
-            ct = ContentType.objects.get(pk=int(cid))
-            mod = ct.model_class()
+            ct, mod = get_content_type(cid)
             instance = mod.objects.get(pk=int(oid))
         except Exception:
             msg = """
@@ -1,15 +1,23 @@
 # -*- coding: utf-8 -*-
 
 import csv
+from functools import lru_cache
 
 from django.contrib import admin
 from django.urls import reverse
-from django.http import HttpResponse
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.urls import reverse
 from django.utils.encoding import smart_str
 from django.utils.safestring import mark_safe
 from djspace.core.admin import PROFILE_LIST
 from djspace.core.admin import GenericAdmin
+from djspace.core.models import prefetch_emails_auxiliary
+from djspace.core.models import prefetch_registrations
+from djspace.core.utils import EXPORT_CHUNK_SIZE
+from djspace.core.utils import Echo
+from djspace.core.utils import field_accessor
+from djspace.core.utils import queryset_chunks
 from djspace.registration.models import *
 
 
@@ -110,42 +118,64 @@ def get_profile_fields(registrant):
     ]
 
 
-def export_registrants(modeladmin, request, queryset):
-    """Export registration data to CSV."""
-    exclude = [
-        'user',
-        'user_id',
-        'updated_by',
-        'updated_by_id',
-        'id',
-        'date_created',
-        'date_updated',
-        'wsgc_affiliate_id',
-        'wsgc_affiliate_id',
-    ]
-    response = HttpResponse('', content_type='text/csv; charset=utf-8')
-    filename = '{0}.csv'.format(modeladmin)
-    response['Content-Disposition'] = 'attachment; filename={0}'.format(filename)
-    writer = csv.writer(response)
-    field_names = [field.name for field in modeladmin.model._meta.get_fields()]
-    headers = PROFILE_HEADERS[0:-1] + field_names
-    # remove unwanted headers
-    for ex in exclude:
-        if ex in headers:
-            headers.remove(ex)
-    writer.writerow(headers)
-
-    for reg in queryset:
-        fields = get_profile_fields(reg)
-        del fields[-1]
-        for field in field_names:
-            if field not in exclude:
+# registration fields that are left out of the export
+EXPORT_EXCLUDE = frozenset([
+    'user',
+    'user_id',
+    'updated_by',
+    'updated_by_id',
+    'id',
+    'date_created',
+    'date_updated',
+    'wsgc_affiliate_id',
+])
+
+
+@lru_cache(maxsize=None)
+def registrant_export_plan(model):
+    """Compile the CSV headers and field accessors for a registration model."""
+    headers = PROFILE_HEADERS[0:-1]
+    columns = []
+    for field in model._meta.get_fields():
+        if field.name not in EXPORT_EXCLUDE:
+            headers.append(field.name)
+            columns.append(field_accessor(field))
+    return tuple(headers), tuple(columns)
+
+
+def registrant_rows(model, queryset):
+    """Generate the CSV lines for the registrants, a chunk at a time."""
+    headers, columns = registrant_export_plan(model)
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    queryset = queryset.select_related('user', 'user__profile')
+    for chunk in queryset_chunks(queryset, EXPORT_CHUNK_SIZE):
+        # users and profiles come with the chunk, everything else that
+        # get_profile_fields() needs is fetched for the chunk in bulk
+        profiles = [reg.user.profile for reg in chunk]
+        prefetch_related_objects(profiles, 'race')
+        prefetch_registrations(profiles)
+        prefetch_emails_auxiliary(profiles)
+        for reg in chunk:
+            fields = get_profile_fields(reg)
+            del fields[-1]
+            for column in columns:
                 try:
-                    field_val = getattr(reg, field, None)
+                    field_val = column(reg)
                 except Exception:
                     field_val = ''
                 fields.append(field_val)
-        writer.writerow(fields)
+            yield writer.writerow(fields)
+
+
+def export_registrants(modeladmin, request, queryset):
+    """Export registration data to CSV."""
+    response = StreamingHttpResponse(
+        registrant_rows(modeladmin.model, queryset),
+        content_type='text/csv; charset=utf-8',
+    )
+    filename = '{0}.csv'.format(modeladmin)
+    response['Content-Disposition'] = 'attachment; filename={0}'.format(filename)
     return response
 
 
@@ -14,16 +14,9 @@ from djspace.registration.models import Undergraduate
 from djtools.fields import STATE_CHOICES
 
 
-try:
-    AFFILIATES = GenericChoice.objects.filter(
-        tags__name__in=['WSGC Affiliates', 'College or University'],
-    ).filter(active=True).order_by('ranking', 'name')
-except Exception:
-    AFFILIATES = GenericChoice.objects.none()
-
-PROGRAMS = GenericChoice.objects.filter(
-    tags__name__in=['Programs'],
-).filter(active=True).order_by('ranking', 'name')
+# generic choice tags for the affiliate and program fields
+AFFILIATE_TAGS = ['WSGC Affiliates', 'College or University']
+PROGRAM_TAGS = ['Programs']
 
 
 class HighSchoolForm(forms.ModelForm):
@@ -42,9 +35,9 @@ class UndergraduateForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         """Override the initialization method to set affiliate choices."""
         super(UndergraduateForm, self).__init__(*args, **kwargs)
-        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.filter(
-            tags__name__in=['College or University'],
-        ).order_by('ranking', 'name')
+        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.tagged(
+            ['College or University'], order_by=('ranking', 'name'),
+        )
 
     class Meta:
         """Attributes about the form and options."""
@@ -127,9 +120,9 @@ class GraduateForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         """Override the initialization method to set affiliate choices."""
         super(GraduateForm, self).__init__(*args, **kwargs)
-        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.filter(
-            tags__name__in=['College or University'],
-        ).order_by('ranking', 'name')
+        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.tagged(
+            ['College or University'], order_by=('ranking', 'name'),
+        )
 
     cumulative_college_credits = forms.CharField(label="Total credits")
     month_year_of_graduation = forms.CharField(
@@ -235,9 +228,16 @@ class GraduateForm(forms.ModelForm):
 class ProfessionalForm(forms.ModelForm):
     """A form to collect professional information."""
 
+    def __init__(self, *args, **kwargs):
+        """Override the initialization method to set affiliate choices."""
+        super(ProfessionalForm, self).__init__(*args, **kwargs)
+        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.tagged(
+            AFFILIATE_TAGS, active=True, order_by=('ranking', 'name'),
+        )
+
     wsgc_affiliate = forms.ModelChoiceField(
         label="WSGC Affiliate",
-        queryset=AFFILIATES,
+        queryset=GenericChoice.objects.none(),
     )
     sponsoring_organization_state = forms.CharField(
         required=False,
@@ -292,9 +292,16 @@ class ProfessionalForm(forms.ModelForm):
 class FacultyForm(forms.ModelForm):
     """A form to collect faculty information."""
 
+    def __init__(self, *args, **kwargs):
+        """Override the initialization method to set affiliate choices."""
+        super(FacultyForm, self).__init__(*args, **kwargs)
+        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.tagged(
+            AFFILIATE_TAGS, active=True, order_by=('ranking', 'name'),
+        )
+
     wsgc_affiliate = forms.ModelChoiceField(
         label="WSGC Affiliate",
-        queryset=AFFILIATES,
+        queryset=GenericChoice.objects.none(),
     )
 
     class Meta:
@@ -319,8 +326,15 @@ class FacultyForm(forms.ModelForm):
 class GrantsOfficerForm(forms.ModelForm):
     """A form to collect grants officer information."""
 
+    def __init__(self, *args, **kwargs):
+        """Override the initialization method to set affiliate choices."""
+        super(GrantsOfficerForm, self).__init__(*args, **kwargs)
+        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.tagged(
+            AFFILIATE_TAGS, active=True, order_by=('ranking', 'name'),
+        )
+
     wsgc_affiliate = forms.ModelChoiceField(
-        label="WSGC Affiliate", queryset=AFFILIATES,
+        label="WSGC Affiliate", queryset=GenericChoice.objects.none(),
     )
     title = forms.CharField(label="Title")
 
@@ -346,13 +360,23 @@ class GrantsOfficerForm(forms.ModelForm):
 class TechnicalAdvisorForm(forms.ModelForm):
     """A form to collect technical advisor information."""
 
+    def __init__(self, *args, **kwargs):
+        """Override the initialization method to set affiliate and program choices."""
+        super(TechnicalAdvisorForm, self).__init__(*args, **kwargs)
+        self.fields['wsgc_affiliate'].queryset = GenericChoice.objects.tagged(
+            AFFILIATE_TAGS, active=True, order_by=('ranking', 'name'),
+        )
+        self.fields['programs'].queryset = GenericChoice.objects.tagged(
+            PROGRAM_TAGS, active=True, order_by=('ranking', 'name'),
+        )
+
     wsgc_affiliate = forms.ModelChoiceField(
-        label="WSGC Affiliate", queryset=AFFILIATES,
+        label="WSGC Affiliate", queryset=GenericChoice.objects.none(),
     )
     title = forms.CharField(label="Title")
     programs = forms.ModelMultipleChoiceField(
         label="Programs",
-        queryset=PROGRAMS,
+        queryset=GenericChoice.objects.none(),
         help_text='Check all that apply',
         widget=forms.CheckboxSelectMultiple(),
     )
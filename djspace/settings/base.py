@@ -34,6 +34,11 @@ MEDIA_URL = '/media/{0}/'.format(PROJECT_APP)
 UPLOADS_DIR = '{0}files/'.format(MEDIA_ROOT)
 UPLOADS_URL = '{0}files/'.format(MEDIA_URL)
 FILE_UPLOAD_PERMISSIONS = 0o644
+# uploads are hashed as they stream in
+FILE_UPLOAD_HANDLERS = (
+    'djspace.core.uploads.HashingMemoryFileUploadHandler',
+    'djspace.core.uploads.HashingTemporaryFileUploadHandler',
+)
 STATICFILES_DIRS = ()
 STATICFILES_FINDERS = (
     'django.contrib.staticfiles.finders.FileSystemFinder',
@@ -255,6 +260,22 @@ WSGC_EMAIL = ''
 WSGC_APPLICATIONS = ''
 WSGC_ROCKET_EMAIL = ''
 ROCKET_LAUNCH_COMPETITION_TEAM_LIMIT = 100
+# admin exports with more objects than this are handed off to the job queue
+EXPORT_JOB_THRESHOLD = 25
+# seconds a job may run before the worker gives up on it
+EXPORT_JOB_TIMEOUT = 60 * 60 * 2
+# hand file downloads off to the web server: 'X-Accel-Redirect' for nginx
+# with DOWNLOAD_OFFLOAD_ROOT set to an internal location that maps to
+# MEDIA_ROOT, or 'X-Sendfile' with DOWNLOAD_OFFLOAD_ROOT = MEDIA_ROOT
+DOWNLOAD_OFFLOAD_HEADER = None
+DOWNLOAD_OFFLOAD_ROOT = ''
+# name autocomplete: minimum term length, result cap, cache seconds
+AUTOCOMPLETE_MIN_LENGTH = 2
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_CACHE_TIMEOUT = 300
+# outbox: messages sent per connection and attempts before giving up
+OUTBOUND_MAIL_BATCH_SIZE = 50
+OUTBOUND_MAIL_MAX_ATTEMPTS = 5
 FILE_UPLOADED_EMAILS = {
     'all': [],
     'rocketlaunchteam': [],